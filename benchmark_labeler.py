@@ -0,0 +1,405 @@
+"""
+Headless benchmarks for the labeler's data paths.
+
+Generates synthetic BULK_FILE / SYNERGY_FILE fixtures at the requested scale
+and times each hot path in its own process, so peak RSS is per benchmark.
+Results are written as JSON to compare runs across commits:
+
+    python benchmark_labeler.py --pairs 10000 100000 --out bench.json
+"""
+
+import argparse
+import functools
+import http.server
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+# === CONFIG ===
+FIXTURES_DIR = "bench-fixtures/"
+CARDS = 30000
+MULTIFACE_RATIO = 0.05
+LABELED_RATIO = 0.1
+JOURNAL_EVENTS = 2000
+SEARCH_QUERIES = ["li", "bolt", "lightning b", "dragn", "sacrifice", "of the"]
+IMAGE_CARDS = 50
+SEED = 1234
+
+WORDS = (
+    "lightning bolt dragon shivan elf llanowar angel serra sol ring counter "
+    "spell wrath god sacrifice outlet ancient tomb of the grave blood sword "
+    "fire ice storm crow phyrexian arena goblin guide knight soul warden"
+).split()
+TYPES = ["Creature — Elf", "Instant", "Sorcery", "Enchantment", "Artifact", "Land"]
+TAGS = ["sacrifice-outlet", "ramp", "removal", "card-draw", "token-maker", "tutor"]
+
+
+def card_name(rng, i):
+    return " ".join(rng.sample(WORDS, rng.randint(1, 3))).title() + f" {i}"
+
+
+def generate_fixtures(directory, pairs, cards, multiface_ratio, image_url):
+    """
+    Write cards.json (Scryfall-like) and synergies.json, one item per line
+    so millions of pairs never sit in memory at once.
+    """
+    os.makedirs(directory, exist_ok=True)
+    bulk_file = os.path.join(directory, "cards.json")
+    synergy_file = os.path.join(directory, "synergies.json")
+    rng = random.Random(SEED)
+    names = []
+    with open(bulk_file, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(cards):
+            name = card_name(rng, i)
+            card = {
+                "id": f"{i:08x}-0000-4000-8000-{i:012x}",
+                "name": name,
+                "layout": "normal",
+                "type_line": rng.choice(TYPES),
+                "oracle_text": " ".join(rng.choices(WORDS, k=20)),
+                "tags_labels": rng.sample(TAGS, 2),
+                "image_uris": {"png": f"{image_url}/{i}.png"},
+                # Fields the labeler never reads, as in the real bulk dump
+                "prices": {"usd": "0.25", "eur": "0.20"},
+                "legalities": {"commander": "legal", "modern": "legal"},
+                "flavor_text": " ".join(rng.choices(WORDS, k=15)),
+            }
+            if rng.random() < multiface_ratio:
+                back = card_name(rng, i) + " Back"
+                card["layout"] = "transform"
+                card["name"] = f"{name} // {back}"
+                card["card_faces"] = [
+                    {
+                        "name": face,
+                        "type_line": "Creature",
+                        "oracle_text": "",
+                        "image_uris": {"png": f"{image_url}/{i}_{n}.png"},
+                    }
+                    for n, face in enumerate([name, back])
+                ]
+                del card["image_uris"]
+            names.append(card["name"])
+            f.write(("," if i else "") + json.dumps(card) + "\n")
+        f.write("]\n")
+    with open(synergy_file, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(pairs):
+            entry = {
+                "card1": {"name": rng.choice(names)},
+                "card2": {"name": rng.choice(names)},
+                "synergy_predicted": rng.random(),
+                "synergy_edhrec": rng.choice([None, 0.0, 1.0]),
+                "synergy": None,
+            }
+            if rng.random() < LABELED_RATIO:
+                entry["synergy_manual"] = rng.choice([-1, -0.5, 0.0, 0.5, 1.0])
+            f.write(("," if i else "") + json.dumps(entry) + "\n")
+        f.write("]\n")
+    return bulk_file, synergy_file
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+# === BENCHMARKS ===
+# Each takes the fixture paths and returns extra metrics to report.
+
+
+def bench_load_json(labeler, bulk_file, synergy_file, workdir):
+    entries = labeler.load_json(synergy_file)
+    return {"entries": len(entries)}
+
+
+def bench_load_cards(labeler, bulk_file, synergy_file, workdir):
+    return {"cards": len(labeler.load_cards(bulk_file))}
+
+
+def bench_card_store(labeler, bulk_file, synergy_file, workdir):
+    store_file = os.path.join(workdir, "cards.store")
+    if os.path.exists(store_file):
+        os.remove(store_file)
+    start = time.perf_counter()
+    labeler.open_card_store(bulk_file, store_file).close()
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    store = labeler.open_card_store(bulk_file, store_file)
+    reopen = time.perf_counter() - start
+    store.close()
+    return {"build_s": build, "reopen_s": reopen}
+
+
+def bench_merge(labeler, bulk_file, synergy_file, workdir):
+    merged_file = os.path.join(workdir, "merged.json")
+    journal_file = os.path.join(workdir, "journal.jsonl")
+    with open(synergy_file, "rb") as src, open(merged_file, "wb") as dst:
+        dst.write(src.read())
+    rng = random.Random(SEED)
+    picked = [
+        labeler.pair_id(entry)
+        for entry in labeler.iter_json_array(synergy_file)
+        if rng.random() < 0.01
+    ][:JOURNAL_EVENTS]
+    journal = labeler.LabelJournal(journal_file)
+    for card1, card2 in picked:
+        journal.append(card1, card2, "synergy_manual", 1.0)
+    journal.close()
+
+    start = time.perf_counter()
+    updates = labeler.replay_journal(labeler.read_journal(journal_file))
+    changed = labeler.merge_updates_into_file(updates, merged_file)
+    return {
+        "journal_events": len(picked),
+        "changed": changed,
+        "merge_s": time.perf_counter() - start,
+    }
+
+
+def bench_queue(labeler, bulk_file, synergy_file, workdir):
+    entries = labeler.load_json(synergy_file)
+    start = time.perf_counter()
+    queue, stats = labeler.build_queue(entries)
+    positions = list(queue)
+    random.shuffle(positions)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    ranker = labeler.PriorityRanker(entries)
+    ranker_build = time.perf_counter() - start
+    start = time.perf_counter()
+    ranker.rank(queue)
+    rank = time.perf_counter() - start
+    return {
+        "queue": len(queue),
+        "build_s": build,
+        "ranker_build_s": ranker_build,
+        "rank_s": rank,
+    }
+
+
+def bench_pair_table(labeler, bulk_file, synergy_file, workdir):
+    # Compare peak RSS with load_json
+    start = time.perf_counter()
+    table = labeler.PairTable.from_json(synergy_file)
+    load = time.perf_counter() - start
+    start = time.perf_counter()
+    queue, stats = labeler.build_queue(table)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    labeler.PriorityRanker(table).rank(queue)
+    rank = time.perf_counter() - start
+    return {
+        "entries": len(table),
+        "load_s": load,
+        "queue_build_s": build,
+        "rank_s": rank,
+    }
+
+
+def bench_suggestions(labeler, bulk_file, synergy_file, workdir):
+    names = [card["name"] for card in labeler.iter_json_array(bulk_file)]
+    start = time.perf_counter()
+    index = labeler.CardNameIndex(names)
+    build = time.perf_counter() - start
+    per_query = {}
+    for query in SEARCH_QUERIES:
+        start = time.perf_counter()
+        for _ in range(100):
+            index.search(query)
+        per_query[query] = (time.perf_counter() - start) / 100 * 1000
+    return {"index_build_s": build, "query_ms": per_query}
+
+
+def bench_images(labeler, bulk_file, synergy_file, workdir):
+    """
+    Cold: download from the local image server and store the rendition.
+    Warm: decode the stored rendition. Both include resize_image.
+    """
+    labeler.IMAGE_CACHE_DIR = os.path.join(workdir, "image-cache/")
+    labeler.DOWNLOAD_RATE_LIMITER.interval = 0
+    cards = []
+    for card in labeler.iter_json_array(bulk_file):
+        cards.append(labeler.project_card(card))
+        if len(cards) == IMAGE_CARDS:
+            break
+    results = {}
+    for phase in ["cold", "warm"]:
+        start = time.perf_counter()
+        for card in cards:
+            labeler.resize_image(labeler.load_or_download_image(card))
+        results[f"{phase}_ms_per_card"] = (
+            (time.perf_counter() - start) / len(cards) * 1000
+        )
+    return results
+
+
+def bench_label_save(labeler, bulk_file, synergy_file, workdir):
+    journal = labeler.LabelJournal(os.path.join(workdir, "save.jsonl"))
+    clicks = 10000
+    start = time.perf_counter()
+    for i in range(clicks):
+        journal.append(f"Card {i}", f"Card {i + 1}", "synergy_manual", 1.0)
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return {"clicks": clicks, "us_per_click": elapsed / clicks * 1e6}
+
+
+BENCHMARKS = {
+    "load_json": bench_load_json,
+    "load_cards": bench_load_cards,
+    "card_store": bench_card_store,
+    "merge": bench_merge,
+    "queue": bench_queue,
+    "pair_table": bench_pair_table,
+    "suggestions": bench_suggestions,
+    "images": bench_images,
+    "label_save": bench_label_save,
+}
+
+
+class ImageHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Stand-in for Scryfall: every path returns the same card-sized PNG.
+    """
+
+    png = b""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(self.png)))
+        self.end_headers()
+        self.wfile.write(self.png)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_image_server():
+    from io import BytesIO
+    from PIL import Image
+
+    buf = BytesIO()
+    Image.effect_noise((745, 1040), 64).convert("RGB").save(buf, format="PNG")
+    handler = type("Handler", (ImageHandler,), {"png": buf.getvalue()})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_one(name, bulk_file, synergy_file, workdir, conn):
+    """
+    Child process: import the labeler, run one benchmark, report back.
+    """
+    import synergy_labeler_2 as labeler
+
+    server = start_image_server() if name == "images" else None
+    if server is not None:
+        # The fixture URLs point at a port chosen in the parent
+        labeler_get = labeler.download_image
+        port = server.server_port
+
+        def download_image(url, **kwargs):
+            path = url.split("/", 3)[3]
+            return labeler_get(f"http://127.0.0.1:{port}/{path}", **kwargs)
+
+        labeler.download_image = download_image
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    extra = BENCHMARKS[name](labeler, bulk_file, synergy_file, workdir)
+    wall = time.perf_counter() - start
+    conn.send(
+        {
+            "wall_s": wall,
+            "peak_rss_mb": peak_rss_mb(),
+            "baseline_rss_mb": baseline,
+            **extra,
+        }
+    )
+    conn.close()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pairs", type=int, nargs="+", default=[10000])
+    parser.add_argument("--cards", type=int, default=CARDS)
+    parser.add_argument("--multiface-ratio", type=float, default=MULTIFACE_RATIO)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for pairs in args.pairs:
+        workdir = os.path.join(
+            args.fixtures_dir,
+            f"pairs{pairs}_cards{args.cards}_mf{args.multiface_ratio}",
+        )
+        bulk_file = os.path.join(workdir, "cards.json")
+        synergy_file = os.path.join(workdir, "synergies.json")
+        if not (os.path.exists(bulk_file) and os.path.exists(synergy_file)):
+            print(f"Generating fixtures in {workdir}")
+            generate_fixtures(
+                workdir, pairs, args.cards, args.multiface_ratio, "http://127.0.0.1:0"
+            )
+        for name in args.only or BENCHMARKS:
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(
+                target=run_one,
+                args=(name, bulk_file, synergy_file, workdir, child_conn),
+            )
+            process.start()
+            # Only the child holds the sending end, so a crash shows up as EOF
+            child_conn.close()
+            try:
+                if parent_conn.poll(3600):
+                    result = parent_conn.recv()
+                else:
+                    result = {"error": "timeout"}
+                    process.terminate()
+            except EOFError:
+                result = None
+            process.join()
+            if result is None:
+                result = {"error": f"child exited with code {process.exitcode}"}
+            result = {"bench": name, "pairs": pairs, **result}
+            print(json.dumps(result))
+            results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "cards": args.cards,
+        "multiface_ratio": args.multiface_ratio,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
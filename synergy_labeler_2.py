@@ -1,22 +1,71 @@
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk, ImageDraw
 import json
 import os
-import requests
+import sqlite3
+import hashlib
+import glob
+import zlib
+import mmap
+import struct
 from io import BytesIO
-import tkinter.font as tkFont
+import numpy as np
+import queue
 import random
+import re
+import time
+import csv
+import functools
+from contextlib import contextmanager
+import argparse
+from array import array
+import threading
+import heapq
+from bisect import bisect_left
+from collections import Counter, deque
+from collections import OrderedDict
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 
 # === CONFIG ===
 BULK_FILE = "cards_with_tags_3709_20250630171610.json"
 
 SYNERGY_FILE_TMP_NAME = "synergies_tmp"
+JOURNAL_FSYNC_EVERY = 20  # fsync the label journal every N label events
+# Below this many journal events, labels are applied on top of SYNERGY_FILE at
+# load time instead of rewriting it
+MERGE_THRESHOLD = 1000
+UNDO_DEPTH = 200  # Label events that can be undone with Ctrl+Z
+
+# Several annotators labeling the same pair set, each on its own shard
+ANNOTATOR_ID = None  # e.g. "alice"; None for a single annotator
+ANNOTATOR_COUNT = 1
+ANNOTATOR_INDEX = 0  # This annotator's shard, 0 <= ANNOTATOR_INDEX < ANNOTATOR_COUNT
+ANNOTATOR_OVERLAP = 0.05  # Share of pairs given to every annotator, for agreement
 IMAGE_CACHE_DIR = "image-dataset/"
+IMAGE_CACHE_FORMAT = "WEBP"  # Format of the pre-scaled renditions ("WEBP" or "JPEG")
+IMAGE_CACHE_QUALITY = 90
 
 IGNORE_EDHREC = True
 SYNERGY_FILE = "new_synergy_deck.json"  # Generated from my Model
 RANDOM_ORDER = True  # If True, the pairs are shuffled randomly
+# "random", "file", "priority" to label the most informative pairs first, or
+# "clustered": shuffled blocks of pairs sharing a card, so its image is reused
+QUEUE_ORDER = "random" if RANDOM_ORDER else "file"
+QUEUE_SEED = 1  # "clustered" order is the same for the same pairs and seed
+CLUSTER_BLOCK = 6  # Max consecutive pairs sharing an anchor card
+QUEUE_FILE_NAME = "synergy_queue"  # Precomputed work queue, see `queue` command
+
+# "json": SYNERGY_FILE + label journal. "sqlite": SYNERGY_DB, imported from
+# SYNERGY_FILE on first use; `db-export` writes the JSON back for the model.
+STORAGE_BACKEND = "json"
+SYNERGY_DB = "synergies.sqlite3"
 
 # IGNORE_EDHREC = False
 # SYNERGY_FILE = "random_real_synergies.json"  # Synergies from EDHREC
@@ -24,12 +73,139 @@ RANDOM_ORDER = True  # If True, the pairs are shuffled randomly
 UI_SCALE = 1.0
 IMAGE_SCALE = 2
 FONT_SIZE = 10
+CARD_IMAGE_HEIGHT = 400  # Before IMAGE_SCALE
+
+# Only these card fields are kept in memory
+CARD_FIELDS = [
+    "id",
+    "name",
+    "layout",
+    "card_faces",
+    "type_line",
+    "oracle_text",
+    "power",
+    "toughness",
+    "tags_labels",
+    "image_uris",
+]
+LOAD_ONLY_REFERENCED_CARDS = False  # Skip cards that appear in no synergy pair
+COMPACT_ENTRIES = True  # Keep the pairs as a PairTable (columns) instead of dicts
+USE_CARD_STORE = True  # Convert BULK_FILE once into a memory-mapped card store
+CARD_STORE_FILE = BULK_FILE + ".store"
+JSON_READ_CHUNK = 1 << 20
+
+SUGGESTION_LIMIT = 10
+SUGGESTION_DEBOUNCE_MS = 120
+
+PREFETCH_DEPTH = 4  # Upcoming pairs whose images are loaded in the background
+RAPID_MODE = False  # Auto-advance to the next unlabeled pair after labeling
+SYNERGY_KEYS = ["1", "2", "3", "4", "5"]  # In the order of the synergy buttons
+SIMILARITY_KEYS = ["q", "w", "e"]  # In the order of the similarity buttons
+PREFETCH_WORKERS = 4
+IO_POLL_MS = 30  # How often the Tk thread picks up finished background jobs
+LOAD_POLL_MS = 100  # How often the startup progress bar is refreshed
+
+TIMINGS_FILE = "labeler_timings.json"  # Stage latencies dumped at exit (.json or .csv)
+TIMING_SAMPLES = 5000  # Most recent samples kept per stage
+IMAGE_MEMORY_CACHE_MB = 512  # Decoded + resized images kept in RAM
+
+HTTP_TIMEOUT = 30
+DOWNLOAD_RETRIES = 4
+DOWNLOAD_BACKOFF = 1.0  # Seconds, doubled after every failed attempt
+DOWNLOAD_RATE_LIMIT = 10  # Requests per second (Scryfall asks for at most 10)
+WARM_WORKERS = 8
+
+EXPORT_DIR = "synergy_export"  # Training shards written by the `export` command
+EXPORT_FORMAT = "npz"  # "npz" or "parquet" (needs pyarrow, recommended)
+EXPORT_SHARD_ROWS = 50000
+EXPORT_WORKERS = os.cpu_count() or 1
+
+# Active learning (QUEUE_ORDER = "priority")
+DECISION_BOUNDARY = 0.5  # synergy_predicted value the model is least sure about
+PRIORITY_WEIGHTS = {"uncertainty": 1.0, "disagreement": 0.5, "coverage": 0.5}
+RERANK_EVERY = 25  # Re-rank the rest of the queue after this many labels
 
 
 def s(value):
     return int(value * UI_SCALE)
 
 
+class StageTimings:
+    """
+    Thread-safe latency samples per stage (image load, resize, display, ...)
+    with p50/p95/p99 summaries.
+    """
+
+    def __init__(self, max_samples=TIMING_SAMPLES):
+        self.max_samples = max_samples
+        self.samples = {}
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.max_samples)
+            self.samples[stage].append(seconds)
+            self.counts[stage] += 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        with self.lock:
+            samples = {stage: sorted(values) for stage, values in self.samples.items()}
+            counts = dict(self.counts)
+        result = {}
+        for stage, values in samples.items():
+            ms = [v * 1000 for v in values]
+            result[stage] = {
+                "count": counts[stage],
+                "p50_ms": ms[int(0.50 * (len(ms) - 1))],
+                "p95_ms": ms[int(0.95 * (len(ms) - 1))],
+                "p99_ms": ms[int(0.99 * (len(ms) - 1))],
+                "max_ms": ms[-1],
+            }
+        return result
+
+    def dump(self, file):
+        summary = self.summary()
+        if file.endswith(".csv"):
+            with open(file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(
+                    ["stage", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+                )
+                for stage, row in sorted(summary.items()):
+                    writer.writerow([stage] + list(row.values()))
+        else:
+            save_json(summary, file)
+
+
+TIMINGS = StageTimings()
+
+
+def timed(stage):
+    """
+    Decorator recording every call of a function under `stage` in TIMINGS.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TIMINGS.stage(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 def sf(size_tuple):
     family = size_tuple[0]
     try:
@@ -46,134 +222,2474 @@ def load_json(file):
         return json.loads(content)
 
 
+def iter_json_array(file, chunk_size=JSON_READ_CHUNK, with_text=False):
+    """
+    Yield the items of a top-level JSON array one by one, reading the file
+    in chunks instead of holding the whole document in memory.
+    With `with_text`, yield (item, source text of the item) pairs.
+    """
+    decoder = json.JSONDecoder()
+    with open(file, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size).lstrip()
+        if not buf:
+            return
+        if buf[0] != "[":
+            raise ValueError(f"{file} is not a JSON array")
+        pos = 1
+        eof = False
+        prev = "["  # last token: "[", "," or an item
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) and buf[pos] in ",]":
+                if buf[pos] == "," and prev == "item":
+                    prev = ","
+                    pos += 1
+                    continue
+                if buf[pos] == "]" and prev != ",":
+                    return
+                raise ValueError(f"{file} has a misplaced {buf[pos]!r} in its array")
+            if pos < len(buf) and prev == "item":
+                raise ValueError(f"{file} is missing a ',' between array items")
+            end = None
+            if pos < len(buf):
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            # Item cut by the chunk boundary (a number like "4.5e3" can also be
+            # decoded short, as "4"): read more until its terminator is buffered
+            if end is None or (
+                not eof and (end == len(buf) or buf[end] not in " \t\r\n,]")
+            ):
+                if eof:
+                    raise ValueError(f"{file} ends before the JSON array is closed")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield (item, buf[pos:end]) if with_text else item
+            prev = "item"
+            pos = end
+
+
+def project_card(card, fields=CARD_FIELDS):
+    projected = {field: card[field] for field in fields if field in card}
+    if "card_faces" in projected:
+        projected["card_faces"] = [
+            {field: face[field] for field in fields if field in face}
+            for face in projected["card_faces"]
+        ]
+    return projected
+
+
+def load_cards(file, names=None):
+    """
+    Stream the bulk cards file keeping only CARD_FIELDS.
+    If `names` is given, cards not in it are skipped.
+    """
+    cards = []
+    for card in iter_json_array(file):
+        if names is not None and card["name"] not in names:
+            continue
+        cards.append(project_card(card))
+    return cards
+
+
+CARD_STORE_MAGIC = b"MTGCARD1"
+# index offset, index length, source size, source mtime_ns, source sha1
+CARD_STORE_HEADER = struct.Struct("<QQQq20s")
+
+
+def file_sha1(file):
+    h = hashlib.sha1()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.digest()
+
+
+def build_card_store(source, store_file):
+    """
+    Convert the bulk cards JSON into a store file:
+    magic | header | one compact JSON record per card | JSON index of
+    {name: [offset, length]}. Written to a temp file and renamed into place.
+    """
+    print(f"Building card store {store_file} from {source}")
+    st = os.stat(source)
+    sha1 = file_sha1(source)
+    index = {}
+    # Per process: several labelers may rebuild a stale store at once
+    tmp_file = f"{store_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(CARD_STORE_MAGIC + bytes(CARD_STORE_HEADER.size))
+        for card in iter_json_array(source):
+            record = json.dumps(project_card(card), separators=(",", ":")).encode(
+                "utf-8"
+            )
+            index[card["name"]] = [f.tell(), len(record)]
+            f.write(record)
+        index_offset = f.tell()
+        data = json.dumps({"fields": CARD_FIELDS, "cards": index}).encode("utf-8")
+        f.write(data)
+        f.seek(len(CARD_STORE_MAGIC))
+        f.write(
+            CARD_STORE_HEADER.pack(
+                index_offset, len(data), st.st_size, st.st_mtime_ns, sha1
+            )
+        )
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, store_file)
+
+
+class CardStore:
+    """
+    Read-only, memory-mapped card lookup by name. Records are decoded on access,
+    and processes opening the same store share its pages.
+    """
+
+    def __init__(self, store_file):
+        self.store_file = store_file
+        self.f = open(store_file, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[: len(CARD_STORE_MAGIC)] != CARD_STORE_MAGIC:
+            self.close()
+            raise ValueError(f"{store_file} is not a card store")
+        (
+            index_offset,
+            index_length,
+            self.source_size,
+            self.source_mtime_ns,
+            self.source_sha1,
+        ) = CARD_STORE_HEADER.unpack_from(self.mm, len(CARD_STORE_MAGIC))
+        index = json.loads(self.mm[index_offset : index_offset + index_length])
+        self.fields = index["fields"]
+        self.index = index["cards"]
+
+    def matches(self, source):
+        """
+        True if the store was built from the current `source` with CARD_FIELDS.
+        Size and mtime are checked first; the hash only when the mtime moved.
+        """
+        if self.fields != CARD_FIELDS:
+            return False
+        st = os.stat(source)
+        if st.st_size != self.source_size:
+            return False
+        if st.st_mtime_ns == self.source_mtime_ns:
+            return True
+        if file_sha1(source) != self.source_sha1:
+            return False
+        # Same content, only touched: remember the new mtime
+        with open(self.store_file, "r+b") as f:
+            f.seek(len(CARD_STORE_MAGIC) + struct.calcsize("<QQQ"))
+            f.write(struct.pack("<q", st.st_mtime_ns))
+        return True
+
+    def __getitem__(self, name):
+        offset, length = self.index[name]
+        return json.loads(self.mm[offset : offset + length])
+
+    def get(self, name, default=None):
+        if name not in self.index:
+            return default
+        return self[name]
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+
+def open_card_store(source, store_file=CARD_STORE_FILE):
+    """
+    Open the card store for `source`, (re)building it if missing or stale.
+    """
+    if os.path.exists(store_file):
+        try:
+            store = CardStore(store_file)
+        except (ValueError, struct.error, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable card store: {e}")
+        else:
+            if store.matches(source):
+                return store
+            store.close()
+    build_card_store(source, store_file)
+    return CardStore(store_file)
+
+
+def name_trigrams(text):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class CardNameIndex:
+    """
+    Autocomplete index over card names. Matches are ranked as: name prefix,
+    word prefix, substring (via trigram postings), then typo-tolerant
+    matches by trigram overlap.
+    """
+
+    def __init__(self, names):
+        self.names = sorted(names, key=str.lower)
+        self.lowered = [name.lower() for name in self.names]
+        # Every word start of every name, so "bolt" finds "Lightning Bolt"
+        self.word_tails = sorted(
+            (low[m.start() :], i)
+            for i, low in enumerate(self.lowered)
+            for m in re.finditer(r"\w+", low)
+        )
+        self.word_keys = [tail for tail, _ in self.word_tails]
+        self.trigrams = {}
+        self.trigram_counts = []
+        for i, low in enumerate(self.lowered):
+            name_tris = name_trigrams(low)
+            self.trigram_counts.append(len(name_tris))
+            for tri in name_tris:
+                self.trigrams.setdefault(tri, []).append(i)
+
+    def search(self, query, limit=SUGGESTION_LIMIT):
+        q = query.strip().lower()
+        if not q:
+            return []
+        found = []
+        seen = set()
+
+        def add(i):
+            if i not in seen:
+                seen.add(i)
+                found.append(i)
+            return len(found) >= limit
+
+        lo = bisect_left(self.lowered, q)
+        for i in range(lo, len(self.lowered)):
+            if not self.lowered[i].startswith(q) or add(i):
+                break
+        if len(found) < limit:
+            lo = bisect_left(self.word_keys, q)
+            for tail, i in self.word_tails[lo:]:
+                if not tail.startswith(q) or add(i):
+                    break
+        query_trigrams = name_trigrams(q)
+        if len(found) < limit and not query_trigrams:
+            # Too short for trigrams: scan for substrings, stopping at the limit
+            for i, low in enumerate(self.lowered):
+                if q in low and add(i):
+                    break
+        postings = [self.trigrams.get(tri, []) for tri in query_trigrams]
+        if len(found) < limit and postings and all(postings):
+            for i in min(postings, key=len):
+                if q in self.lowered[i] and add(i):
+                    break
+        if len(found) < limit and query_trigrams:
+            # Trigrams shared by a large share of all names barely rank anything
+            # but dominate the counting cost, so they are left out when possible
+            max_posting = max(len(self.names) // 50, 1000)
+            counted = [p for p in postings if len(p) <= max_posting] or postings
+            overlap = Counter()
+            for posting in counted:
+                overlap.update(posting)
+            min_overlap = max(1, len(counted) // 2)
+            n_query = len(query_trigrams)
+            ranked = heapq.nlargest(
+                limit,
+                (i for i, n in overlap.items() if n >= min_overlap),
+                # Jaccard similarity of the trigram sets
+                key=lambda i: overlap[i]
+                / (n_query + self.trigram_counts[i] - overlap[i]),
+            )
+            for i in ranked:
+                if add(i):
+                    break
+        return [self.names[i] for i in found]
+
+
+def card_text_faces(card):
+    layout = card.get("layout", "normal")
+    is_special = layout in [
+        "transform",
+        "modal_dfc",
+        "split",
+        "flip",
+        "adventure",
+    ]
+    return card["card_faces"] if is_special and "card_faces" in card else [card]
+
+
+def card_rules_text(card):
+    """
+    Name, type line, rules text and P/T of every face, as shown in the labeler.
+    """
+    text_lines = []
+    for face in card_text_faces(card):
+        name_line = face.get("name", "")
+        type_line = face.get("type_line", "")
+        oracle = face.get("oracle_text", "")
+        power = face.get("power", "")
+        toughness = face.get("toughness", "")
+        pt = f"\nP/T: {power} / {toughness}" if power and toughness else ""
+
+        line = f"{name_line}\n{type_line}\n{oracle}"
+        line += pt
+        text_lines.append(line)
+
+    return "\n----------\n".join(text_lines)
+
+
 def save_json(data, file):
     with open(file, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2)
 
 
-def load_or_download_image(card):
-    os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+class LabelJournal:
+    """
+    Append-only log of label events, one JSON object per line.
+    Every event is flushed to the OS immediately, fsync is batched.
+    """
+
+    def __init__(self, file, fsync_every=JOURNAL_FSYNC_EVERY, annotator=None):
+        self.file = file
+        self.fsync_every = fsync_every
+        self.annotator = annotator
+        self.unsynced = 0
+        self.f = open(file, "a", encoding="utf-8")
+
+    @timed("journal_write")
+    def append(self, card1, card2, field, value):
+        record = {"card1": card1, "card2": card2, "field": field, "value": value}
+        if self.annotator is not None:
+            record["annotator"] = self.annotator
+        self.f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.f.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.f.fileno())
+            self.unsynced = 0
+
+    def reset(self):
+        """
+        Empty the journal once its events are merged into the synergies file.
+        """
+        self.f.truncate(0)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+
+def read_journal(file):
+    """
+    Yield the label events stored in a journal file.
+    A torn last line (process killed mid-write) is skipped.
+    """
+    if not os.path.exists(file):
+        return
+    with open(file, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping corrupt journal line {line_number} in {file}")
+
+
+def replay_journal(records):
+    """
+    Fold label events into {(card1, card2): {field: value}}, last event wins.
+    """
+    updates = {}
+    for record in records:
+        key = canonical_pair(record["card1"], record["card2"])
+        updates.setdefault(key, {})[record["field"]] = record["value"]
+    return updates
+
+
+def legacy_tmp_updates(file):
+    """
+    Label updates from the old synergies_tmp.json format (full list of entries).
+    """
+    if not os.path.exists(file):
+        return {}
+    updates = {}
+    for entry in load_json(file):
+        key = pair_id(entry)
+        for field in ["synergy_manual", "similarity"]:
+            if entry.get(field) is not None:
+                updates.setdefault(key, {})[field] = entry[field]
+    return updates
+
+
+def canonical_pair(card1, card2):
+    return (card1, card2) if card1 <= card2 else (card2, card1)
+
+
+def pair_id(entry):
+    """
+    Order-independent pair ID: (A, B) and (B, A) are the same pair.
+    """
+    return canonical_pair(entry["card1"]["name"], entry["card2"]["name"])
+
+
+class PairIndex:
+    """
+    Interned card IDs, and order-independent pair keys packed in one int
+    (smaller ID in the high 32 bits) for sets over millions of pairs.
+    """
+
+    def __init__(self):
+        self.card_ids = {}
+
+    def card_id(self, name):
+        return self.card_ids.setdefault(name, len(self.card_ids))
+
+    def key(self, card1, card2):
+        a, b = self.card_id(card1), self.card_id(card2)
+        return a << 32 | b if a <= b else b << 32 | a
+
+    def entry_key(self, entry):
+        return self.key(entry["card1"]["name"], entry["card2"]["name"])
+
+
+def is_labeled(entry):
+    return (
+        entry.get("synergy_manual") is not None or entry.get("similarity") is not None
+    )
+
+
+class LabelSession:
+    """
+    Pairs labeled this session, keyed by pair ID in labeling order, plus
+    bounded undo/redo stacks of label events (queue position, entry, field,
+    old value, new value).
+    """
+
+    def __init__(self, undo_depth=UNDO_DEPTH):
+        self.labeled = {}
+        self.undo_stack = deque(maxlen=undo_depth)
+        self.redo_stack = deque(maxlen=undo_depth)
+
+    def track(self, entry):
+        key = pair_id(entry)
+        if is_labeled(entry):
+            self.labeled[key] = entry
+        else:
+            self.labeled.pop(key, None)
+
+    def record(self, ptr, entry, field, old, new):
+        self.undo_stack.append((ptr, entry, field, old, new))
+        self.redo_stack.clear()
+
+    def undo(self):
+        """
+        Pop the last label event, returns (ptr, entry, field, value to restore).
+        """
+        if not self.undo_stack:
+            return None
+        event = self.undo_stack.pop()
+        self.redo_stack.append(event)
+        ptr, entry, field, old, _ = event
+        return ptr, entry, field, old
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        event = self.redo_stack.pop()
+        self.undo_stack.append(event)
+        ptr, entry, field, _, new = event
+        return ptr, entry, field, new
+
+
+def counts_toward_labeling(entry):
+    if IGNORE_EDHREC:
+        return True
+    # dont count the labels that are fake edhrec None synergy = 0/1
+    return entry.get("synergy_edhrec", None) is not None
+
+
+def build_queue(entries):
+    """
+    Positions (in file order) of the pairs still to label, plus label
+    coverage statistics. Aliases of a pair ((B, A) after (A, B), or a repeat)
+    are counted once: the queue gets the first one, and none of them if
+    any alias is labeled.
+    """
+    if isinstance(entries, PairTable):
+        return entries.build_queue()
+    index = PairIndex()
+    first = {}  # pair key -> position of its first alias, -1 once labeled
+    for i, entry in enumerate(entries):
+        if not counts_toward_labeling(entry):
+            continue
+        key = index.entry_key(entry)
+        if is_labeled(entry):
+            first[key] = -1
+        elif key not in first:
+            first[key] = i
+    queue = array("I", (i for i in first.values() if i >= 0))
+    stats = {"entries": len(first), "labeled": len(first) - len(queue)}
+    return queue, stats
+
+
+def label_statistics(entries):
+    """
+    Label coverage and label value counts, every alias of a pair counted once.
+    """
+    index = PairIndex()
+    pairs = set()
+    labels = {}  # pair key -> {field: value}, first alias carrying the field wins
+    cards = set()
+    labeled_cards = set()
+    for entry in entries:
+        if not counts_toward_labeling(entry):
+            continue
+        key = index.entry_key(entry)
+        pairs.add(key)
+        names = pair_id(entry)
+        cards.update(names)
+        if is_labeled(entry):
+            labeled_cards.update(names)
+            fields = labels.setdefault(key, {})
+            for field in ["synergy_manual", "similarity"]:
+                if entry.get(field) is not None:
+                    fields.setdefault(field, entry[field])
+    stats = {
+        "entries": len(pairs),
+        "labeled": len(labels),
+        "synergy_manual": Counter(),
+        "similarity": Counter(),
+    }
+    for fields in labels.values():
+        for field, value in fields.items():
+            stats[field][value] += 1
+    stats["coverage"] = stats["labeled"] / stats["entries"] if stats["entries"] else 0.0
+    stats["cards"] = len(cards)
+    stats["cards_with_labels"] = len(labeled_cards)
+    for field in ["synergy_manual", "similarity"]:
+        stats[field] = dict(sorted(stats[field].items()))
+    return stats
+
+
+def optional_floats(entries, field):
+    return np.fromiter(
+        (np.nan if e.get(field) is None else e[field] for e in entries),
+        dtype=np.float32,
+        count=len(entries),
+    )
+
+
+def score_uncertainty(ranker, positions):
+    """
+    1 on the decision boundary, 0 for the most confident prediction.
+    """
+    distance = np.abs(ranker.predicted[positions] - DECISION_BOUNDARY)
+    farthest = np.nanmax(distance) if np.isfinite(distance).any() else 0
+    if not farthest:
+        return np.zeros(len(positions), dtype=np.float32)
+    return np.nan_to_num(1 - distance / farthest)
+
+
+def score_disagreement(ranker, positions):
+    """
+    How far the model is from EDHREC, 0 when either is missing.
+    """
+    gap = np.abs(ranker.predicted[positions] - ranker.edhrec[positions])
+    return np.clip(np.nan_to_num(gap), 0, 1)
+
+
+def score_coverage(ranker, positions):
+    """
+    Favor pairs whose cards have few labels so far.
+    """
+    labels = ranker.card_labels[ranker.card1[positions]]
+    labels = labels + ranker.card_labels[ranker.card2[positions]]
+    return 1 / (1 + labels)
+
+
+PRIORITY_SCORERS = {
+    "uncertainty": score_uncertainty,
+    "disagreement": score_disagreement,
+    "coverage": score_coverage,
+}
+
+
+FILTER_FIELDS = ["tag", "type", "text"]
+
+
+def card_terms(card):
+    """
+    Filter terms of a card: "tag:" + each tag, "type:" + each type line word
+    and "text:" + each rules text word, lowercased, over every face.
+    """
+    terms = {"tag:" + tag.lower() for tag in card.get("tags_labels", [])}
+    for face in card_text_faces(card) + [card]:
+        terms.update(
+            "type:" + w
+            for w in re.findall(r"[\w'-]+", face.get("type_line", "").lower())
+        )
+        terms.update(
+            "text:" + w
+            for w in re.findall(r"[\w'-]+", face.get("oracle_text", "").lower())
+        )
+    return terms
+
+
+def parse_filter_query(text):
+    """
+    "tag:sacrifice-outlet" -> [["tag:sacrifice-outlet"]]. Terms separated by
+    spaces must all match one card; "&" separates the terms of the two cards,
+    as in "type:creature & type:enchantment". A bare word is a text: term.
+    """
+    sides = [side.split() for side in text.lower().split("&")]
+    if len(sides) > 2:
+        raise ValueError("A filter has at most two sides, one per card")
+    for terms in sides:
+        if not terms:
+            raise ValueError("Empty side in filter")
+        for i, term in enumerate(terms):
+            field, sep, _ = term.partition(":")
+            if not sep:
+                terms[i] = "text:" + term
+            elif field not in FILTER_FIELDS:
+                raise ValueError(
+                    f"Unknown filter field {field!r}, use {', '.join(FILTER_FIELDS)}"
+                )
+    return sides
+
+
+class PairFilterIndex:
+    """
+    Inverted index for filtered queues: filter terms -> card IDs (built on
+    first use from the card data), and card IDs -> the pairs they are in
+    (CSR arrays). Pair k is at `positions[k]` and has cards `card1[k]` and
+    `card2[k]`, IDs into `card_names`.
+    """
+
+    def __init__(self, card_names, card1, card2, positions):
+        self.card_names = card_names
+        self.card1 = card1
+        self.card2 = card2
+        self.positions = positions
+        ids = np.concatenate([self.card1, self.card2])
+        order = np.argsort(ids, kind="stable")
+        # Pairs of card c: pair_postings[pair_offsets[c] : pair_offsets[c + 1]]
+        self.pair_postings = np.concatenate([np.arange(len(self.card1))] * 2)[order]
+        self.pair_offsets = np.searchsorted(
+            ids[order], np.arange(len(self.card_names) + 1)
+        )
+        self.terms = None
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Index (position, (card1, card2)) pairs.
+        """
+        index = PairIndex()
+        positions, card1, card2 = array("q"), array("i"), array("i")
+        for position, (a, b) in pairs:
+            positions.append(position)
+            card1.append(index.card_id(a))
+            card2.append(index.card_id(b))
+        return cls(
+            list(index.card_ids),
+            np.frombuffer(card1, dtype=np.int32),
+            np.frombuffer(card2, dtype=np.int32),
+            np.frombuffer(positions, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_table(cls, table):
+        # Copies: replace_card may change the table's cards meanwhile
+        return cls(
+            list(table.card_names),
+            table.card1.copy(),
+            table.card2.copy(),
+            np.arange(len(table), dtype=np.int64),
+        )
+
+    def build_terms(self, card_lookup):
+        terms = {}
+        for card_id, name in enumerate(self.card_names):
+            card = card_lookup.get(name)
+            if card is not None:
+                for term in card_terms(card):
+                    terms.setdefault(term, array("i")).append(card_id)
+        self.terms = {
+            term: np.frombuffer(ids, dtype=np.int32) for term, ids in terms.items()
+        }
+
+    def card_mask(self, terms):
+        mask = np.zeros(len(self.card_names), dtype=bool)
+        mask[self.terms.get(terms[0], [])] = True
+        for term in terms[1:]:
+            other = np.zeros_like(mask)
+            other[self.terms.get(term, [])] = True
+            mask &= other
+        return mask
+
+    def pairs_with(self, mask):
+        """
+        Indexes of the pairs with a card in `mask`: from the postings when
+        they are few, else by one pass over the card columns.
+        """
+        cards = np.flatnonzero(mask)
+        counts = self.pair_offsets[cards + 1] - self.pair_offsets[cards]
+        if counts.sum() > len(self.card1) // 4:
+            return np.flatnonzero(mask[self.card1] | mask[self.card2])
+        if not len(cards):
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(
+            np.concatenate(
+                [
+                    self.pair_postings[self.pair_offsets[c] : self.pair_offsets[c + 1]]
+                    for c in cards
+                ]
+            )
+        )
+
+    def query(self, text, card_lookup):
+        """
+        Positions of the pairs matching a filter query, see parse_filter_query.
+        """
+        sides = parse_filter_query(text)
+        if self.terms is None:
+            self.build_terms(card_lookup)
+        masks = [self.card_mask(terms) for terms in sides]
+        if len(masks) == 1:
+            return self.positions[self.pairs_with(masks[0])]
+        a, b = masks
+        # Walk the postings of the rarer side and check the other card of each pair
+        # against the other side
+        k = self.pairs_with(a if a.sum() <= b.sum() else b)
+        c1, c2 = self.card1[k], self.card2[k]
+        keep = (a[c1] & b[c2]) | (b[c1] & a[c2])
+        return self.positions[k[keep]]
+
+
+def cluster_order(pairs, seed=QUEUE_SEED, block_size=CLUSTER_BLOCK):
+    """
+    Queue order for QUEUE_ORDER = "clustered". `pairs` are (position, (card1,
+    card2)). They are shuffled with `seed`, then regrouped into blocks of up
+    to `block_size` pairs sharing an anchor card, so consecutive pairs reuse
+    that card's image and text. Returns the positions.
+    """
+    pairs = list(pairs)
+    random.Random(seed).shuffle(pairs)
+    by_card = {}
+    for k, (_, names) in enumerate(pairs):
+        for name in set(names):
+            by_card.setdefault(name, []).append(k)
+    cursor = dict.fromkeys(by_card, 0)  # by_card[card][:cursor] are all scheduled
+    scheduled = bytearray(len(pairs))
+    order = []
+    for k, (position, (card1, card2)) in enumerate(pairs):
+        if scheduled[k]:
+            continue
+        scheduled[k] = 1
+        order.append(position)
+        # Anchor on the card with more pairs left to group
+        left1 = len(by_card[card1]) - cursor[card1]
+        left2 = len(by_card[card2]) - cursor[card2]
+        anchor = card1 if left1 >= left2 else card2
+        partners = by_card[anchor]
+        c = cursor[anchor]
+        block = 1
+        while block < block_size and c < len(partners):
+            j = partners[c]
+            c += 1
+            if not scheduled[j]:
+                scheduled[j] = 1
+                order.append(pairs[j][0])
+                block += 1
+        cursor[anchor] = c
+    return order
+
+
+class PriorityRanker:
+    """
+    Active-learning ordering of the unlabeled pairs. Holds per-pair arrays
+    (indexed by position in the synergies file) that the PRIORITY_SCORERS
+    read. The queue is sorted by the PRIORITY_WEIGHTS-weighted score sum.
+    """
+
+    def __init__(self, entries, weights=PRIORITY_WEIGHTS):
+        self.weights = weights
+        if isinstance(entries, PairTable):
+            # Card columns are copied: replace_card may add card IDs to the
+            # table that card_labels has no slot for. Labels are tracked by
+            # set_labeled, the score columns are shared.
+            self.card1 = entries.card1.copy()
+            self.card2 = entries.card2.copy()
+            self.predicted = entries.columns["synergy_predicted"]
+            self.edhrec = entries.columns["synergy_edhrec"]
+            self.labeled = entries.labeled_mask()
+            self.card_labels = np.bincount(
+                self.card1[self.labeled], minlength=len(entries.card_names)
+            ) + np.bincount(self.card2[self.labeled], minlength=len(entries.card_names))
+            return
+        card_ids = {}
+        self.card1 = np.fromiter(
+            (card_ids.setdefault(e["card1"]["name"], len(card_ids)) for e in entries),
+            dtype=np.int32,
+            count=len(entries),
+        )
+        self.card2 = np.fromiter(
+            (card_ids.setdefault(e["card2"]["name"], len(card_ids)) for e in entries),
+            dtype=np.int32,
+            count=len(entries),
+        )
+        self.predicted = optional_floats(entries, "synergy_predicted")
+        self.edhrec = optional_floats(entries, "synergy_edhrec")
+        self.labeled = np.fromiter(
+            (is_labeled(e) for e in entries), dtype=bool, count=len(entries)
+        )
+        self.card_labels = np.bincount(
+            self.card1[self.labeled], minlength=len(card_ids)
+        ) + np.bincount(self.card2[self.labeled], minlength=len(card_ids))
+
+    def set_labeled(self, position, labeled):
+        if self.labeled[position] == labeled:
+            return
+        self.labeled[position] = labeled
+        delta = 1 if labeled else -1
+        self.card_labels[self.card1[position]] += delta
+        self.card_labels[self.card2[position]] += delta
+
+    def rank(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        score = np.zeros(len(positions), dtype=np.float32)
+        for name, weight in self.weights.items():
+            if weight:
+                score += weight * PRIORITY_SCORERS[name](self, positions)
+        return positions[np.argsort(-score, kind="stable")]
+
+
+PAIR_COLUMNS = [
+    "synergy_predicted",
+    "synergy_edhrec",
+    "synergy",
+    "synergy_manual",
+    "similarity",
+]
+
+
+class PairTable:
+    """
+    Synergy entries as columns: card1 / card2 as int32 IDs into `card_names`
+    and PAIR_COLUMNS as float32, NaN when unset. table[i] is a PairView that
+    reads and writes like the entry dict; views of rows that were indexed are
+    kept, so `queue[ptr] is entry` still holds. Fields outside PAIR_COLUMNS are
+    not kept, they stay in the synergies file; `annotated` marks the rows
+    that have an "annotations" list (written by merge-annotators).
+    """
+
+    def __init__(self, card_names, card1, card2, columns, annotated=None):
+        self.card_names = card_names
+        self.card_ids = {name: i for i, name in enumerate(card_names)}
+        self.card1 = card1
+        self.card2 = card2
+        self.columns = columns
+        if annotated is None:
+            annotated = np.zeros(len(card1), dtype=bool)
+        self.annotated = annotated
+        self.views = {}
+
+    @classmethod
+    def from_entries(cls, entries):
+        index = PairIndex()
+        card1, card2 = array("i"), array("i")
+        columns = {field: array("f") for field in PAIR_COLUMNS}
+        annotated = array("b")
+        nan = float("nan")
+        for entry in entries:
+            card1.append(index.card_id(entry["card1"]["name"]))
+            card2.append(index.card_id(entry["card2"]["name"]))
+            for field, column in columns.items():
+                value = entry.get(field)
+                column.append(nan if value is None else value)
+            annotated.append(bool(entry.get("annotations")))
+        return cls(
+            list(index.card_ids),
+            np.frombuffer(card1, dtype=np.int32),
+            np.frombuffer(card2, dtype=np.int32),
+            {
+                field: np.frombuffer(column, dtype=np.float32)
+                for field, column in columns.items()
+            },
+            np.frombuffer(annotated, dtype=bool),
+        )
+
+    @classmethod
+    def from_json(cls, file):
+        """
+        Stream a synergies file into a table, no entry dict outlives its row.
+        """
+        return cls.from_entries(iter_json_array(file))
+
+    def __len__(self):
+        return len(self.card1)
+
+    def __getitem__(self, i):
+        view = self.views.get(i)
+        if view is None:
+            if not 0 <= i < len(self):
+                raise IndexError(i)
+            view = self.views[i] = PairView(self, i)
+        return view
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.views.get(i) or PairView(self, i)
+
+    def card_id(self, name):
+        card_id = self.card_ids.get(name)
+        if card_id is None:
+            card_id = self.card_ids[name] = len(self.card_names)
+            self.card_names.append(name)
+        return card_id
+
+    def pair_id(self, i):
+        names = self.card_names
+        return canonical_pair(names[self.card1[i]], names[self.card2[i]])
+
+    def pair_keys(self):
+        """
+        Order-independent int64 key of every row, as PairIndex.key.
+        """
+        a = self.card1.astype(np.int64)
+        b = self.card2.astype(np.int64)
+        return np.minimum(a, b) << 32 | np.maximum(a, b)
+
+    def labeled_mask(self):
+        return ~np.isnan(self.columns["synergy_manual"]) | ~np.isnan(
+            self.columns["similarity"]
+        )
+
+    def counted_mask(self):
+        if IGNORE_EDHREC:
+            return np.ones(len(self), dtype=bool)
+        return ~np.isnan(self.columns["synergy_edhrec"])
+
+    def build_queue(self):
+        """
+        build_queue() with array operations.
+        """
+        counted = np.flatnonzero(self.counted_mask())
+        keys = self.pair_keys()[counted]
+        pairs, first = np.unique(keys, return_index=True)
+        labeled_pairs = np.unique(keys[self.labeled_mask()[counted]])
+        still_open = ~np.isin(pairs, labeled_pairs, assume_unique=True)
+        queue = array("I")
+        queue.frombytes(np.sort(counted[first[still_open]]).astype(np.uint32).tobytes())
+        return queue, {"entries": len(pairs), "labeled": len(labeled_pairs)}
+
+    def apply_updates(self, updates):
+        """
+        apply_updates() with one pass over the pair keys.
+        """
+        wanted = {}
+        for (card1, card2), fields in updates.items():
+            a, b = self.card_ids.get(card1), self.card_ids.get(card2)
+            if a is not None and b is not None:
+                wanted[min(a, b) << 32 | max(a, b)] = fields
+        if not wanted:
+            return 0
+        keys = self.pair_keys()
+        hits = np.flatnonzero(np.isin(keys, np.fromiter(wanted, dtype=np.int64)))
+        changed = 0
+        for i in hits.tolist():
+            entry = self[i]
+            fields = wanted[int(keys[i])]
+            if any(entry.get(k) != v for k, v in fields.items()):
+                entry.update(fields)
+                changed += 1
+        return changed
+
+
+class PairView:
+    """
+    One PairTable row, used like an entry dict: entry["card1"]["name"],
+    entry.get("synergy_manual"), entry["similarity"] = 0.5.
+    """
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, field):
+        if field in ("card1", "card2"):
+            return PairCardView(self.table, self.index, field)
+        if field not in self.table.columns:
+            raise KeyError(field)
+        return self.get(field)
+
+    def get(self, field, default=None):
+        if field in ("card1", "card2"):
+            return self[field]
+        column = self.table.columns.get(field)
+        if column is None:
+            return default
+        value = column[self.index]
+        return default if np.isnan(value) else float(value)
+
+    def __setitem__(self, field, value):
+        if field not in self.table.columns:
+            raise KeyError(f"PairTable has no {field!r} column")
+        self.table.columns[field][self.index] = np.nan if value is None else value
+
+    def update(self, fields):
+        for field, value in fields.items():
+            self[field] = value
+
+
+class PairCardView:
+    """
+    entry["card1"] of a PairView: just the "name", which can be replaced.
+    """
+
+    __slots__ = ("table", "index", "side")
+
+    def __init__(self, table, index, side):
+        self.table = table
+        self.index = index
+        self.side = side
+
+    def column(self):
+        return self.table.card1 if self.side == "card1" else self.table.card2
+
+    def __getitem__(self, key):
+        if key != "name":
+            raise KeyError(key)
+        return self.table.card_names[self.column()[self.index]]
+
+    def get(self, key, default=None):
+        return self[key] if key == "name" else default
+
+    def __setitem__(self, key, value):
+        if key != "name":
+            raise KeyError(key)
+        self.column()[self.index] = self.table.card_id(value)
+
+
+class SynergyDB:
+    """
+    SQLite store of the synergy pairs (WAL mode). Row ids are the positions of
+    the entries in the JSON file they were imported from. Fields other than
+    the card names and PAIR_COLUMNS are kept as JSON in `extra`.
+    Every thread gets its own connection.
+    """
+
+    def __init__(self, file=SYNERGY_DB):
+        self.file = file
+        self.local = threading.local()
+        conn = self.conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pairs (
+                id INTEGER PRIMARY KEY,
+                card1 TEXT NOT NULL,
+                card2 TEXT NOT NULL,
+                synergy_predicted REAL,
+                synergy_edhrec REAL,
+                synergy REAL,
+                synergy_manual REAL,
+                similarity REAL,
+                extra TEXT
+            )
+            """)
+
+    def conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.file)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def create_indexes(self):
+        conn = self.conn()
+        conn.execute("CREATE INDEX IF NOT EXISTS pairs_cards ON pairs (card1, card2)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS pairs_unlabeled ON pairs (id) "
+            "WHERE synergy_manual IS NULL AND similarity IS NULL"
+        )
+        conn.commit()
+
+    def is_empty(self):
+        return self.conn().execute("SELECT 1 FROM pairs LIMIT 1").fetchone() is None
+
+    def import_json(self, file, batch_size=50000):
+        """
+        Replace the pairs with the entries of a synergies JSON file (streamed).
+        """
+        conn = self.conn()
+        conn.execute("DROP INDEX IF EXISTS pairs_cards")
+        conn.execute("DROP INDEX IF EXISTS pairs_unlabeled")
+        conn.execute("DELETE FROM pairs")
+        placeholders = ", ".join("?" * (len(PAIR_COLUMNS) + 4))
+        sql = f"INSERT INTO pairs VALUES ({placeholders})"
+        batch = []
+        for i, entry in enumerate(iter_json_array(file)):
+            # Card objects with more than the name go to `extra` whole
+            extra = {
+                k: v
+                for k, v in entry.items()
+                if k not in PAIR_COLUMNS
+                and not (k in ("card1", "card2") and v.keys() == {"name"})
+            }
+            row = self.entry_row(i, entry, extra)
+            if list(self.row_to_entry(row)) != list(entry):
+                # Absent columns or another field order: keep the layout so
+                # db-export writes the entry back as it was
+                row = self.entry_row(i, entry, {**extra, "_fields": list(entry)})
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(sql, batch)
+                batch = []
+        conn.executemany(sql, batch)
+        conn.commit()
+        self.create_indexes()
+
+    def entry_row(self, row_id, entry, extra):
+        return (
+            (row_id, entry["card1"]["name"], entry["card2"]["name"])
+            + tuple(entry.get(c) for c in PAIR_COLUMNS)
+            + (json.dumps(extra) if extra else None,)
+        )
+
+    def row_to_entry(self, row):
+        entry = {"card1": {"name": row[1]}, "card2": {"name": row[2]}}
+        for column, value in zip(PAIR_COLUMNS, row[3:8]):
+            entry[column] = value
+        fields = None
+        if row[8]:
+            extra = json.loads(row[8])
+            fields = extra.pop("_fields", None)
+            entry.update(extra)
+        if fields is None:
+            fields = [k for k in entry if k not in ("synergy_manual", "similarity")]
+        # Labels set after the import are written even if the source had none
+        for column in ("synergy_manual", "similarity"):
+            if column not in fields and entry[column] is not None:
+                fields = fields + [column]
+        return {k: entry[k] for k in fields if k in entry}
+
+    def iter_entries(self):
+        cursor = self.conn().execute("SELECT * FROM pairs ORDER BY id")
+        for row in cursor:
+            yield self.row_to_entry(row)
+
+    def export_json(self, file):
+        """
+        Write the pairs as a synergies JSON file (same layout as save_json),
+        through a temp file renamed into place.
+        """
+        tmp_file = file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as out:
+            out.write("[")
+            for n, entry in enumerate(self.iter_entries()):
+                out.write(",\n  " if n else "\n  ")
+                out.write(json.dumps(entry, indent=2).replace("\n", "\n  "))
+            out.write("\n]")
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_file, file)
+
+    def entry(self, row_id):
+        row = self.conn().execute("SELECT * FROM pairs WHERE id = ?", (row_id,))
+        return self.row_to_entry(row.fetchone())
+
+    def edhrec_filter(self):
+        return "" if IGNORE_EDHREC else " AND synergy_edhrec IS NOT NULL"
+
+    def queue_pairs(self, ignore_annotated=False):
+        """
+        (id, pair ID) of the unlabeled pairs, from the partial index: the first
+        alias of each pair, and no alias of a pair labeled under another.
+        With `ignore_annotated`, the mean labels of annotated rows do not count.
+        """
+        unlabeled = "synergy_manual IS NULL AND similarity IS NULL"
+        labeled_q = "(q.synergy_manual IS NOT NULL OR q.similarity IS NOT NULL)"
+        if ignore_annotated:
+            annotated = "json_extract({}.extra, '$.annotations') IS NOT NULL"
+            unlabeled = f"(({unlabeled}) OR {annotated.format('p')})"
+            labeled_q = f"({labeled_q} AND NOT {annotated.format('q')})"
+        where = (
+            f"WHERE {unlabeled}"
+            " AND NOT EXISTS (SELECT 1 FROM pairs AS q WHERE "
+            "((q.card1 = p.card1 AND q.card2 = p.card2) "
+            "OR (q.card1 = p.card2 AND q.card2 = p.card1)) "
+            f"AND {labeled_q})"
+        )
+        cursor = self.conn().execute(
+            f"SELECT id, card1, card2 FROM pairs AS p {where}"
+            + self.edhrec_filter()
+            + " ORDER BY id"
+        )
+        index = PairIndex()
+        seen = set()
+        for row_id, card1, card2 in cursor:
+            key = index.key(card1, card2)
+            if key not in seen:
+                seen.add(key)
+                yield row_id, canonical_pair(card1, card2)
+
+    def stats(self):
+        """
+        Pair counts as in build_queue, aliases counted once.
+        """
+        conn = self.conn()
+        pair = "min(card1, card2) || char(31) || max(card1, card2)"
+        where = "WHERE 1" + self.edhrec_filter()
+        (entries,) = conn.execute(
+            f"SELECT COUNT(DISTINCT {pair}) FROM pairs {where}"
+        ).fetchone()
+        (labeled,) = conn.execute(
+            f"SELECT COUNT(DISTINCT {pair}) FROM pairs {where} "
+            "AND (synergy_manual IS NOT NULL OR similarity IS NOT NULL)"
+        ).fetchone()
+        return {"entries": entries, "labeled": labeled}
+
+    def referenced_cards(self):
+        cursor = self.conn().execute(
+            "SELECT card1 FROM pairs UNION SELECT card2 FROM pairs"
+        )
+        return {name for (name,) in cursor}
+
+    def pair_names(self):
+        """
+        (id, pair ID) of every pair.
+        """
+        for row_id, card1, card2 in self.conn().execute(
+            "SELECT id, card1, card2 FROM pairs ORDER BY id"
+        ):
+            yield row_id, canonical_pair(card1, card2)
+
+    def priority_entries(self, ignore_annotated=False):
+        """
+        Lightweight entries (in id order) with just what PriorityRanker reads.
+        With `ignore_annotated`, annotated rows come without their mean labels.
+        """
+        labels = "synergy_manual, similarity"
+        if ignore_annotated:
+            annotated = "json_extract(extra, '$.annotations') IS NOT NULL"
+            labels = (
+                f"CASE WHEN {annotated} THEN NULL ELSE synergy_manual END, "
+                f"CASE WHEN {annotated} THEN NULL ELSE similarity END"
+            )
+        cursor = self.conn().execute(
+            "SELECT card1, card2, synergy_predicted, synergy_edhrec, "
+            f"{labels} FROM pairs ORDER BY id"
+        )
+        return [
+            {
+                "card1": {"name": card1},
+                "card2": {"name": card2},
+                "synergy_predicted": predicted,
+                "synergy_edhrec": edhrec,
+                "synergy_manual": manual,
+                "similarity": similarity,
+            }
+            for card1, card2, predicted, edhrec, manual, similarity in cursor
+        ]
+
+    def set_label(self, card1, card2, field, value):
+        """
+        Label every alias of the pair, the same as replaying a journal event.
+        """
+        self.update(card1, card2, field, value)
+        self.conn().commit()
+
+    def update(self, card1, card2, field, value):
+        if field not in ("synergy_manual", "similarity"):
+            raise ValueError(f"Not a label field: {field}")
+        self.conn().execute(
+            f"UPDATE pairs SET {field} = ? "
+            "WHERE (card1 = ? AND card2 = ?) OR (card1 = ? AND card2 = ?)",
+            (value, card1, card2, card2, card1),
+        )
+
+    def apply_updates(self, updates):
+        """
+        Apply journal updates in one transaction.
+        """
+        for (card1, card2), fields in updates.items():
+            for field, value in fields.items():
+                self.update(card1, card2, field, value)
+        self.conn().commit()
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+class DBEntries:
+    """
+    Synergy entries by row id, read from the database on first access and
+    kept, so labels set in memory stay visible while rows update in the background.
+    `updates` are journal labels not in the database (annotator mode); with
+    `drop_annotated` the mean labels of annotated rows are left out first.
+    """
+
+    def __init__(self, db, updates=None, drop_annotated=False):
+        self.db = db
+        self.updates = updates or {}
+        self.drop_annotated = drop_annotated
+        self.rows = {}
+
+    def __getitem__(self, row_id):
+        entry = self.rows.get(row_id)
+        if entry is None:
+            entry = self.rows[row_id] = self.db.entry(row_id)
+            if self.drop_annotated:
+                drop_annotated_labels([entry])
+            entry.update(self.updates.get(pair_id(entry), {}))
+        return entry
+
+
+class QueueView:
+    """
+    The work queue as a sequence of entries: queue[k] is entries[positions[k]].
+    """
+
+    def __init__(self, positions, entries):
+        self.positions = positions
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, k):
+        return self.entries[self.positions[k]]
+
+
+QUEUE_MAGIC = b"MTGQUEU2"  # 2: one position per pair, aliases deduplicated
+
+
+def queue_file_name():
+    suffix = "" if IGNORE_EDHREC else "_edhrec"
+    return f"{QUEUE_FILE_NAME}{suffix}.bin"
+
+
+def save_queue(queue, stats, source, file):
+    """
+    Queue file: magic | u32 header length | JSON header | uint32 positions.
+    """
+    st = os.stat(source)
+    header = {
+        "source_size": st.st_size,
+        "source_mtime_ns": st.st_mtime_ns,
+        "ignore_edhrec": IGNORE_EDHREC,
+        "stats": stats,
+    }
+    data = json.dumps(header).encode("utf-8")
+    # Per process: annotators sharing a directory rebuild the queue concurrently
+    tmp_file = f"{file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(QUEUE_MAGIC + struct.pack("<I", len(data)) + data)
+        queue.tofile(f)
+    os.replace(tmp_file, file)
+
+
+def load_queue(file, source):
+    """
+    (queue, stats) from a queue file, or None if it is missing, unreadable or
+    was built from another version of `source`.
+    """
+    if not os.path.exists(file):
+        return None
+    with open(file, "rb") as f:
+        if f.read(len(QUEUE_MAGIC)) != QUEUE_MAGIC:
+            return None
+        try:
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length))
+            st = os.stat(source)
+            if (
+                header["source_size"] != st.st_size
+                or header["source_mtime_ns"] != st.st_mtime_ns
+                or header["ignore_edhrec"] != IGNORE_EDHREC
+            ):
+                return None
+            queue = array("I")
+            queue.frombytes(f.read())
+            stats = header["stats"]
+        except (struct.error, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring unreadable queue file {file}: {e}")
+            return None
+    return queue, stats
+
+
+def write_journal_records(records, file):
+    """
+    Atomically replace a JSON-lines file with `records`.
+    """
+    tmp_file = file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, file)
+
+
+def write_journal(updates, file, annotator=None):
+    """
+    Atomically replace a journal with one event per (pair, field) of `updates`.
+    """
+    extra = {} if annotator is None else {"annotator": annotator}
+    write_journal_records(
+        (
+            {"card1": card1, "card2": card2, "field": field, "value": value, **extra}
+            for (card1, card2), fields in updates.items()
+            for field, value in fields.items()
+        ),
+        file,
+    )
+
+
+def in_shard(key, count, index, overlap=ANNOTATOR_OVERLAP):
+    """
+    Deterministic assignment of a pair to one of `count` annotators; an
+    `overlap` share of the pairs goes to everyone.
+    """
+    if count <= 1:
+        return True
+    h = zlib.crc32("\x1f".join(key).encode("utf-8"))
+    if (h % 10007) < overlap * 10007:
+        return True
+    return (h // 10007) % count == index
+
+
+def journal_base_name():
+    return SYNERGY_FILE_TMP_NAME + ("" if IGNORE_EDHREC else "_edhrec")
+
+
+def annotator_journal_file(annotator):
+    return f"{journal_base_name()}.annotator-{annotator}.jsonl"
+
+
+def merge_annotator_journals(journal_files):
+    """
+    One pass over every annotator journal. Returns
+    {pair: {annotator: {field: value}}}, the last event of each annotator winning.
+    """
+    labels = {}
+    for file in journal_files:
+        for record in read_journal(file):
+            annotator = record.get("annotator", file)
+            key = canonical_pair(record["card1"], record["card2"])
+            fields = labels.setdefault(key, {}).setdefault(annotator, {})
+            fields[record["field"]] = record["value"]
+    return labels
+
+
+def annotation_updates(labels):
+    """
+    Entry updates for the synergies file: every annotator's labels under
+    "annotations", and the mean label as synergy_manual / similarity.
+    """
+    updates = {}
+    for key, by_annotator in labels.items():
+        fields = {
+            "annotations": [
+                {"annotator": annotator, **values}
+                for annotator, values in sorted(by_annotator.items())
+            ]
+        }
+        for field in ["synergy_manual", "similarity"]:
+            values = [
+                v[field] for v in by_annotator.values() if v.get(field) is not None
+            ]
+            if values:
+                fields[field] = sum(values) / len(values)
+        updates[key] = fields
+    return updates
+
+
+def agreement_statistics(labels):
+    """
+    For pairs labeled by more than one annotator: how often all labels match,
+    the mean absolute difference, and exact agreement per annotator pair.
+    """
+    stats = {}
+    for field in ["synergy_manual", "similarity"]:
+        shared = agree = 0
+        abs_diff = 0.0
+        by_pair = {}
+        for by_annotator in labels.values():
+            values = {
+                a: v[field] for a, v in by_annotator.items() if v.get(field) is not None
+            }
+            if len(values) < 2:
+                continue
+            shared += 1
+            agree += len(set(values.values())) == 1
+            abs_diff += max(values.values()) - min(values.values())
+            annotators = sorted(values)
+            for i, a in enumerate(annotators):
+                for b in annotators[i + 1 :]:
+                    counts = by_pair.setdefault(f"{a}|{b}", [0, 0])
+                    counts[0] += values[a] == values[b]
+                    counts[1] += 1
+        stats[field] = {
+            "shared_pairs": shared,
+            "exact_agreement": agree / shared if shared else None,
+            "mean_range": abs_diff / shared if shared else None,
+            "pairwise_agreement": {
+                pair: same / total for pair, (same, total) in sorted(by_pair.items())
+            },
+        }
+    stats["annotators"] = sorted({a for v in labels.values() for a in v})
+    stats["labeled_pairs"] = len(labels)
+    return stats
+
+
+def apply_updates(entries, updates):
+    """
+    Apply journal updates to synergy entries (every alias of a pair) in place,
+    returns how many changed.
+    """
+    if isinstance(entries, PairTable):
+        return entries.apply_updates(updates)
+    changed = 0
+    for entry in entries:
+        fields = updates.get(pair_id(entry))
+        if fields and any(entry.get(k) != v for k, v in fields.items()):
+            entry.update(fields)
+            changed += 1
+    return changed
+
+
+def drop_annotated_labels(entries):
+    """
+    Clear synergy_manual and similarity of the entries merge-annotators wrote
+    (the ones with "annotations"): they hold the mean of every annotator.
+    Labels from before the annotators started are kept.
+    """
+    if isinstance(entries, PairTable):
+        entries.columns["synergy_manual"][entries.annotated] = np.nan
+        entries.columns["similarity"][entries.annotated] = np.nan
+        return
+    for entry in entries:
+        if entry.get("annotations"):
+            entry.pop("synergy_manual", None)
+            entry.pop("similarity", None)
+
+
+def merge_updates_into_file(updates, file, dedup=False):
+    """
+    Apply journal updates to a synergies JSON file. Entries are streamed, and
+    the ones that did not change are copied as their original text.
+    With `dedup`, only the first alias of each pair is kept.
+    The result goes to a temp file renamed over `file`, so a crash mid-merge
+    leaves the original intact. Returns the number of changed or dropped entries.
+    """
+    tmp_file = file + ".tmp"
+    changed = 0
+    index = PairIndex()
+    seen = set()
+    n = 0
+    with open(tmp_file, "w", encoding="utf-8") as out:
+        out.write("[")
+        for entry, text in iter_json_array(file, with_text=True):
+            if dedup:
+                key = index.entry_key(entry)
+                if key in seen:
+                    changed += 1
+                    continue
+                seen.add(key)
+            if apply_updates([entry], updates):
+                text = json.dumps(entry, indent=2).replace("\n", "\n  ")
+                changed += 1
+            out.write(",\n  " if n else "\n  ")
+            out.write(text)
+            n += 1
+        out.write("\n]")
+        out.flush()
+        os.fsync(out.fileno())
+    if changed:
+        os.replace(tmp_file, file)
+    else:
+        os.remove(tmp_file)
+    return changed
+
+
+class RateLimiter:
+    """
+    Spaces calls to wait() at least 1 / rate seconds apart, across threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+DOWNLOAD_RATE_LIMITER = RateLimiter(DOWNLOAD_RATE_LIMIT)
+
+
+def http_session():
+    """
+    Shared requests session, so image downloads reuse pooled connections.
+    """
+    import requests
+
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=WARM_WORKERS, pool_maxsize=WARM_WORKERS
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "labelerMtg/1.0"
+            _http_session = session
+        return _http_session
+
+
+def download_image(url, retries=DOWNLOAD_RETRIES, rate_limiter=DOWNLOAD_RATE_LIMITER):
+    """
+    Download and decode an image. Retries with exponential backoff on
+    connection errors, 429 and 5xx; raises if the response is not a valid image.
+    """
+    import requests
+    from PIL import Image
+
+    delay = DOWNLOAD_BACKOFF
+    for attempt in range(retries + 1):
+        rate_limiter.wait()
+        try:
+            response = http_session().get(url, timeout=HTTP_TIMEOUT)
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                raise requests.HTTPError(f"HTTP {response.status_code} for {url}")
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError):
+            if attempt == retries:
+                raise
+            time.sleep(delay)
+            delay *= 2
+            continue
+        response.raise_for_status()
+        if not response.headers.get("Content-Type", "").startswith("image/"):
+            raise ValueError(f"{url} did not return an image")
+        Image.open(BytesIO(response.content)).verify()
+        img = Image.open(BytesIO(response.content))
+        img.load()
+        return img
+
+
+def save_image_atomic(img, path, **save_args):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    img.save(tmp_path, **save_args)
+    os.replace(tmp_path, path)
+
+
+def legacy_image_path(face_name, cache_dir=None):
+    """
+    Where images were cached before the content-addressed cache (by face name).
+    """
+    safe_name = face_name.replace("/", "_").replace(" ", "_")
+    return os.path.join(cache_dir or IMAGE_CACHE_DIR, f"{safe_name}.png")
+
+
+def card_image_key(card):
+    """
+    Scryfall ID of the card, or a hash of its name for cards without one.
+    """
+    if card.get("id"):
+        return card["id"]
+    return "name-" + hashlib.sha1(card["name"].encode("utf-8")).hexdigest()
+
+
+def card_image_faces(card):
+    """
+    (face name, png url) for every image shown for a card.
+    """
     layout = card.get("layout", "normal")
-    is_multiface = "card_faces" in card and layout in ["transform", "modal_dfc"]
+    if "card_faces" in card and layout in ["transform", "modal_dfc"]:
+        return [
+            (face.get("name", "face"), face.get("image_uris", {}).get("png"))
+            for face in card["card_faces"]
+        ]
+    return [(card["name"], card.get("image_uris", {}).get("png"))]
+
+
+def placeholder_image(text="No Image"):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (300, 420), color="gray")
+    draw = ImageDraw.Draw(img)
+    draw.text((10, 190), text, fill="black")
+    return img
+
+
+class ImageDiskCache:
+    """
+    On-disk cache of card face images keyed by (card key, face index), stored
+    as renditions pre-scaled to the display height. manifest.jsonl is an
+    append-only log of {key, file, url, height, name}; gc() compacts it and
+    deletes files it no longer references.
+    """
+
+    def __init__(self, cache_dir=None):
+        cache_dir = cache_dir or IMAGE_CACHE_DIR
+        self.cache_dir = cache_dir
+        self.renditions_dir = os.path.join(cache_dir, "renditions")
+        self.manifest_file = os.path.join(cache_dir, "manifest.jsonl")
+        self.lock = threading.Lock()
+        os.makedirs(self.renditions_dir, exist_ok=True)
+        self.manifest = {}
+        for record in read_journal(self.manifest_file):
+            self.manifest[record["key"]] = record
+
+    def rendition_height(self):
+        return int(CARD_IMAGE_HEIGHT * IMAGE_SCALE)
+
+    def rendition_path(self, key, height):
+        ext = "webp" if IMAGE_CACHE_FORMAT == "WEBP" else "jpg"
+        shard = hashlib.sha1(key.encode("utf-8")).hexdigest()[:2]
+        return os.path.join(self.renditions_dir, shard, f"{key}_{height}.{ext}")
+
+    def lookup(self, key, url):
+        """
+        Path of the cached rendition for `key`, or None if missing or stale.
+        """
+        with self.lock:
+            record = self.manifest.get(key)
+        if (
+            record is None
+            or record["url"] != url
+            or record["height"] != self.rendition_height()
+        ):
+            return None
+        path = os.path.join(self.cache_dir, record["file"])
+        return path if os.path.exists(path) else None
+
+    def store(self, key, url, name, img):
+        from PIL import Image
+
+        height = self.rendition_height()
+        w, h = img.size
+        if h != height:
+            img = img.resize((int(w * height / h), height), Image.LANCZOS)
+        img = img.convert("RGB")
+        path = self.rendition_path(key, height)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_image_atomic(
+            img, path, format=IMAGE_CACHE_FORMAT, quality=IMAGE_CACHE_QUALITY
+        )
+        record = {
+            "key": key,
+            "file": os.path.relpath(path, self.cache_dir),
+            "url": url,
+            "height": height,
+            "name": name,
+        }
+        with self.lock:
+            self.manifest[key] = record
+            with open(self.manifest_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        return img
+
+    def get(self, key, url, name, rate_limiter=DOWNLOAD_RATE_LIMITER):
+        """
+        The face image at display height: from the cache, from an old
+        name-keyed PNG, or downloaded. Faces without a URL get a placeholder
+        that is not cached.
+        """
+        from PIL import Image
 
-    def get_image(face_name, url):
-        safe_name = face_name.replace("/", "_").replace(" ", "_")
-        image_path = os.path.join(IMAGE_CACHE_DIR, f"{safe_name}.png")
-        if os.path.exists(image_path):
-            return Image.open(image_path)
         if not url:
-            img = Image.new("RGB", (300, 420), color="gray")
-            draw = ImageDraw.Draw(img)
-            draw.text((10, 190), "No Image", fill="black")
-            img.save(image_path)
+            return placeholder_image()
+        path = self.lookup(key, url)
+        if path is not None:
+            with TIMINGS.stage("image_decode"):
+                img = Image.open(path)
+                img.load()
             return img
-        response = requests.get(url)
-        img = Image.open(BytesIO(response.content))
-        img.save(image_path)
+        img = self.load_legacy(name)
+        if img is None:
+            with TIMINGS.stage("image_download"):
+                img = download_image(url, rate_limiter=rate_limiter)
+        return self.store(key, url, name, img)
+
+    def load_legacy(self, name):
+        """
+        The old name-keyed PNG of a face, or None. The old scheme stored "A/B",
+        "A B" and "A_B" in one file, so names with "/" or "_" are not trusted.
+        Files that do not decode are deleted, so the next get() downloads.
+        """
+        from PIL import Image
+
+        if "/" in name or "_" in name:
+            return None
+        path = legacy_image_path(name, self.cache_dir)
+        if not os.path.exists(path):
+            return None
+        try:
+            Image.open(path).verify()
+            img = Image.open(path)
+            img.load()
+        except (OSError, SyntaxError, ValueError) as e:
+            print(f"Ignoring unreadable cached image {path}: {e}")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another thread got there first
+            return None
         return img
 
-    if is_multiface:
-        faces = card["card_faces"]
-        images = []
-        for face in faces:
-            face_name = face.get("name", "face")
-            url = face.get("image_uris", {}).get("png")
-            images.append(get_image(face_name, url))
-
-        # Combine images side by side
-        widths, heights = zip(*(img.size for img in images))
-        total_width = sum(widths)
-        max_height = max(heights)
-        combined = Image.new("RGB", (total_width, max_height))
-        x_offset = 0
-        for img in images:
-            combined.paste(img, (x_offset, 0))
-            x_offset += img.size[0]
-        return combined
-    else:
-        name = card["name"].replace("/", "_").replace(" ", "_")
-        url = card.get("image_uris", {}).get("png")
-        return get_image(name, url)
+    def gc(self, remove_legacy=False):
+        """
+        Compact the manifest and delete renditions it does not reference,
+        leftover temp files and, if asked, the old name-keyed PNGs.
+        Returns the number of deleted files.
+        """
+        with self.lock:
+            live = {
+                key: record
+                for key, record in self.manifest.items()
+                if os.path.exists(os.path.join(self.cache_dir, record["file"]))
+            }
+            self.manifest = live
+            write_journal_records(live.values(), self.manifest_file)
+        referenced = {os.path.normpath(r["file"]) for r in live.values()}
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            top_level = os.path.samefile(dirpath, self.cache_dir)
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                rel = os.path.normpath(os.path.relpath(path, self.cache_dir))
+                orphan = rel.startswith("renditions" + os.sep) and rel not in referenced
+                legacy = remove_legacy and top_level and filename.endswith(".png")
+                if filename.endswith(".tmp") or orphan or legacy:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+_image_disk_cache = None
+_image_disk_cache_lock = threading.Lock()
+
+
+def image_disk_cache():
+    global _image_disk_cache
+    with _image_disk_cache_lock:
+        if _image_disk_cache is None:
+            _image_disk_cache = ImageDiskCache()
+        return _image_disk_cache
+
+
+@timed("image_load")
+def load_or_download_image(card):
+    import requests
+    from PIL import Image
 
+    cache = image_disk_cache()
+    key = card_image_key(card)
+
+    def get_image(face_index, face_name, url):
+        try:
+            return cache.get(f"{key}_{face_index}", url, face_name)
+        except (requests.RequestException, OSError, ValueError) as e:
+            # Not cached, the next display tries again
+            print(f"Failed to download {face_name}: {e}")
+            return placeholder_image("Download failed")
+
+    images = [
+        get_image(i, face_name, url)
+        for i, (face_name, url) in enumerate(card_image_faces(card))
+    ]
+    if len(images) == 1:
+        return images[0]
+
+    # Combine images side by side
+    widths, heights = zip(*(img.size for img in images))
+    total_width = sum(widths)
+    max_height = max(heights)
+    combined = Image.new("RGB", (total_width, max_height))
+    x_offset = 0
+    for img in images:
+        combined.paste(img, (x_offset, 0))
+        x_offset += img.size[0]
+    return combined
+
+
+def warm_image_cache(
+    card_lookup, names, workers=WARM_WORKERS, rate=DOWNLOAD_RATE_LIMIT
+):
+    """
+    Download every missing face image of the cards in `names` concurrently.
+    Faces already cached are skipped, so an interrupted run resumes.
+    Returns (downloaded, failed) counts.
+    """
+    import requests
+
+    cache = image_disk_cache()
+    missing = []
+    for name in names:
+        card = card_lookup.get(name)
+        if card is None:
+            continue
+        key = card_image_key(card)
+        for i, (face_name, url) in enumerate(card_image_faces(card)):
+            if url and cache.lookup(f"{key}_{i}", url) is None:
+                missing.append((f"{key}_{i}", url, face_name))
+    print(f"{len(missing)} images to download")
+
+    rate_limiter = RateLimiter(rate)
+    downloaded = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(cache.get, key, url, face_name, rate_limiter): face_name
+            for key, url, face_name in missing
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                downloaded += 1
+            except (requests.RequestException, OSError, ValueError) as e:
+                print(f"Failed to download {futures[future]}: {e}")
+                failed += 1
+            done = downloaded + failed
+            if done % 500 == 0:
+                print(f"{done} / {len(missing)}")
+    return downloaded, failed
+
+
+@timed("image_resize")
+def resize_image(img, height=CARD_IMAGE_HEIGHT):
+    from PIL import Image
 
-def resize_image(img, height=400):
     height = int(height * IMAGE_SCALE)
     w, h = img.size
+    if h == height:
+        return img
     new_w = int((height / h) * w)
     return img.resize((new_w, height), Image.LANCZOS)
 
 
+class ImageCache:
+    """
+    Thread-safe LRU of resized card images, capped by decoded pixel bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def image_bytes(img):
+        w, h = img.size
+        return w * h * len(img.getbands())
+
+    def get(self, key):
+        with self.lock:
+            img = self.images.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self.images.move_to_end(key)
+            self.hits += 1
+            return img
+
+    def put(self, key, img):
+        nbytes = self.image_bytes(img)
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            old = self.images.pop(key, None)
+            if old is not None:
+                self.size_bytes -= self.image_bytes(old)
+            self.images[key] = img
+            self.size_bytes += nbytes
+            self.shrink(self.max_bytes)
+
+    def shrink(self, max_bytes):
+        """
+        Evict least recently used images until the cache fits in `max_bytes`.
+        Call with the lock held.
+        """
+        while self.size_bytes > max_bytes and self.images:
+            _, img = self.images.popitem(last=False)
+            self.size_bytes -= self.image_bytes(img)
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.images),
+                "megabytes": self.size_bytes / (1024 * 1024),
+            }
+
+
+IMAGE_MEMORY_CACHE = ImageCache(IMAGE_MEMORY_CACHE_MB * 1024 * 1024)
+
+
+def load_display_image(card, height=CARD_IMAGE_HEIGHT):
+    layout = card.get("layout", "normal")
+    faces = (
+        len(card.get("card_faces", [])) if layout in ["transform", "modal_dfc"] else 1
+    )
+    key = (card["name"], layout, faces, height, IMAGE_SCALE)
+    img = IMAGE_MEMORY_CACHE.get(key)
+    if img is None:
+        img = resize_image(load_or_download_image(card), height)
+        IMAGE_MEMORY_CACHE.put(key, img)
+    return img
+
+
+class IOExecutor:
+    """
+    Runs blocking I/O off the Tk thread, on named lanes: "disk" has a single
+    worker so writes keep their order, "images" has PREFETCH_WORKERS.
+    Workers put finished jobs on a thread-safe queue and a root.after() poll
+    runs their callbacks on the Tk thread.
+    """
+
+    def __init__(self, root, lanes=None):
+        self.root = root
+        lanes = lanes or {"disk": 1, "images": PREFETCH_WORKERS}
+        self.executors = {
+            lane: ThreadPoolExecutor(max_workers=n, thread_name_prefix=lane)
+            for lane, n in lanes.items()
+        }
+        self.pending = Counter()
+        self.finished = queue.Queue()
+        self.on_status = None  # called with `pending` when it changes
+        self.poll_job = self.root.after(IO_POLL_MS, self.poll)
+
+    def submit(self, lane, fn, *args, callback=None):
+        """
+        Run fn(*args) on `lane`. `callback(future)` runs on the Tk thread.
+        """
+        self.pending[lane] += 1
+        future = self.executors[lane].submit(fn, *args)
+        future.add_done_callback(lambda f: self.finished.put((lane, f, callback)))
+        self.report_status()
+        return future
+
+    def poll(self):
+        changed = False
+        while True:
+            try:
+                lane, future, callback = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.pending[lane] -= 1
+            changed = True
+            if callback is not None and not future.cancelled():
+                try:
+                    callback(future)
+                except Exception as e:
+                    # A failing callback must not stop the polling
+                    print(f"Callback of a background {lane} job failed: {e!r}")
+            elif not future.cancelled() and future.exception() is not None:
+                print(f"Background {lane} job failed: {future.exception()}")
+        if changed:
+            self.report_status()
+        self.poll_job = self.root.after(IO_POLL_MS, self.poll)
+
+    def report_status(self):
+        if self.on_status is not None:
+            self.on_status(self.pending)
+
+    def shutdown(self):
+        """
+        Drop queued image loads but finish every pending write.
+        """
+        try:
+            self.root.after_cancel(self.poll_job)
+        except tk.TclError:
+            pass  # window already destroyed
+        for lane, executor in self.executors.items():
+            executor.shutdown(wait=lane == "disk", cancel_futures=lane != "disk")
+
+
+class ImagePrefetcher:
+    """
+    Downloads, decodes and resizes card images on the "images" lane.
+    PhotoImages must be created on the Tk thread, which happens in the job
+    callback; `on_ready(name)` then lets the UI show an image it was waiting for.
+    """
+
+    def __init__(self, io, on_ready):
+        self.io = io
+        self.on_ready = on_ready
+        self.pending = {}  # card name -> Future of the resized PIL image
+        self.ready = {}  # card name -> PhotoImage
+
+    def load(self, name, card):
+        self.pending[name] = self.io.submit(
+            "images",
+            load_display_image,
+            card,
+            callback=lambda future: self.loaded(name, future),
+        )
+
+    def loaded(self, name, future):
+        if self.pending.get(name) is not future:
+            return  # dropped by prefetch() meanwhile
+        del self.pending[name]
+        from PIL import ImageTk
+
+        try:
+            img = future.result()
+            with TIMINGS.stage("photo_image"):
+                self.ready[name] = ImageTk.PhotoImage(img)
+        except Exception as e:
+            print(f"Failed to load image for {name}: {e}")
+            return
+        self.on_ready(name)
+
+    def prefetch(self, cards):
+        """
+        Keep only the images of `cards` around and start loading the missing ones.
+        """
+        wanted = {card["name"]: card for card in cards}
+        for name in list(self.ready):
+            if name not in wanted:
+                del self.ready[name]
+        for name in list(self.pending):
+            if name not in wanted and self.pending[name].cancel():
+                del self.pending[name]
+        for name, card in wanted.items():
+            if name not in self.ready and name not in self.pending:
+                self.load(name, card)
+
+    def get(self, card):
+        """
+        PhotoImage for `card`, or None while it is loading (on_ready follows).
+        """
+        name = card["name"]
+        if name not in self.ready and name not in self.pending:
+            self.load(name, card)
+        return self.ready.get(name)
+
+
 class SynergyApp:
-    def __init__(self, root):
-        if IGNORE_EDHREC:
-            self.synergy_file_tmp = SYNERGY_FILE_TMP_NAME + ".json"
+    def __init__(
+        self,
+        root,
+        annotator=ANNOTATOR_ID,
+        shards=ANNOTATOR_COUNT,
+        shard=ANNOTATOR_INDEX,
+    ):
+        self.started = time.perf_counter()
+        self.annotator = annotator
+        if annotator is None:
+            self.synergy_file_tmp = journal_base_name() + ".jsonl"
         else:
-            self.synergy_file_tmp = SYNERGY_FILE_TMP_NAME + "_edhrec.json"
+            # Annotators only write their own journal, merge-annotators combines them
+            self.synergy_file_tmp = annotator_journal_file(annotator)
+        # Before the journal, progress was saved as a full JSON list
+        self.synergy_file_tmp_legacy = journal_base_name() + ".json"
 
-        self.merge_synergies_files()
         self.root = root
+        self.io = IOExecutor(root, {"disk": 1, "images": PREFETCH_WORKERS, "index": 1})
         self.root.title("MTG Synergy Labeler")
         self.root.configure(bg="#f0f0f0")
 
-        self.cards = load_json(BULK_FILE)
-        self.card_lookup = {card["name"]: card for card in self.cards}
-
-        self.synergy_entries = load_json(SYNERGY_FILE)
-        if not IGNORE_EDHREC:
-            # dont count the labels that are fake edhrec None synergy = 0/1
-            self.synergy_entries = [
-                entry
-                for entry in self.synergy_entries
-                if entry.get("synergy_edhrec", None) is not None
-            ]
-        print("synergy entries length:", len(self.synergy_entries))
+        # Empty until load_data finishes, the window is drawn first
+        self.loaded = False
+        self.load_progress = (0, "Starting")
+        self.journal = None
+        self.db = None
+        self.synergy_entries = []
+        self.card_lookup = {}
+        self.card_names = []
+        self.name_index = CardNameIndex([])
+        self.suggestion_jobs = [None, None]
+        self.entries_count = 0
+        self.ranker = None
+        self.pair_filter = None  # PairFilterIndex, built by the first filter query
+        self.rerank_job = None
+        self.filter_base = None  # (queue positions, current_ptr) before filtering
+        self.labeled_since_rank = []
+        # synergies_without_manual[k] is synergy_entries[queue_positions[k]]
+        self.queue_positions = []
+        self.synergies_without_manual = QueueView([], [])
+
+        self.session = LabelSession()
+        self.already_labeled_number = 0
 
-        self.synergies_without_manual = [
-            entry
-            for entry in self.synergy_entries
-            if (entry.get("synergy_manual") is None and entry.get("similarity") is None)
-        ]
-        if RANDOM_ORDER:
-            random.shuffle(self.synergies_without_manual)
+        # Now we include all synergy entries to navigate all pairs
+        self.current_ptr = 0  # pointer into synergy_entries list
 
-        self.synergies_labeled_this_session = []
+        self.prefetcher = ImagePrefetcher(self.io, self.image_ready)
 
-        self.already_labeled_number = len(self.synergy_entries) - len(
-            self.synergies_without_manual
+        self.setup_ui()
+        self.io.on_status = self.show_io_status
+        TIMINGS.record("time_to_window", time.perf_counter() - self.started)
+        self.io.submit(
+            "disk",
+            self.load_data,
+            annotator,
+            shards,
+            shard,
+            callback=self.data_loaded,
         )
+        self.show_load_progress()
 
-        # Now we include all synergy entries to navigate all pairs
-        self.current_ptr = 0  # pointer into synergy_entries list
+    def report_load(self, percent, text):
+        # Called from the loader thread, show_load_progress picks it up
+        self.load_progress = (percent, text)
 
-        self.setup_ui()
+    def show_load_progress(self):
+        if self.loaded:
+            return
+        percent, text = self.load_progress
+        self.load_bar["value"] = percent
+        self.configure_if_changed(self.load_label, text=text)
+        self.root.after(LOAD_POLL_MS, self.show_load_progress)
+
+    def load_data(self, annotator, shards, shard):
+        """
+        Runs on the disk lane: compacts the journal, loads the pairs and cards
+        and builds the queue. Touches no widget, data_loaded installs the result.
+        """
+        self.report_load(5, "Reading the label journal")
+        journal_updates, merge_due = self.merge_synergies_files()
+        journal = LabelJournal(self.synergy_file_tmp, annotator=annotator)
+
+        db = None
+        if STORAGE_BACKEND == "sqlite":
+            db = SynergyDB(SYNERGY_DB)
+            if db.is_empty():
+                self.report_load(10, f"Importing {SYNERGY_FILE} into {SYNERGY_DB}")
+                db.import_json(SYNERGY_FILE)
+            if annotator is None:
+                # Labels go straight to the database, the journal is not needed
+                db.apply_updates(journal_updates)
+                journal.reset()
+                journal_updates = {}
+            merge_due = False
+            synergy_entries = DBEntries(
+                db, journal_updates, drop_annotated=annotator is not None
+            )
+        else:
+            self.report_load(10, f"Loading {SYNERGY_FILE}")
+            if COMPACT_ENTRIES:
+                synergy_entries = PairTable.from_json(SYNERGY_FILE)
+            else:
+                synergy_entries = load_json(SYNERGY_FILE)
+            if annotator is not None:
+                # Merged labels are everyone's mean, an annotator works from
+                # their own journal for those pairs
+                drop_annotated_labels(synergy_entries)
+            apply_updates(synergy_entries, journal_updates)
+
+        self.report_load(40, f"Loading cards from {BULK_FILE}")
+        if USE_CARD_STORE:
+            card_lookup = open_card_store(BULK_FILE)
+        else:
+            referenced = None
+            if LOAD_ONLY_REFERENCED_CARDS and db is not None:
+                referenced = db.referenced_cards()
+            elif LOAD_ONLY_REFERENCED_CARDS and isinstance(synergy_entries, PairTable):
+                referenced = set(synergy_entries.card_names)
+            elif LOAD_ONLY_REFERENCED_CARDS:
+                referenced = set()
+                for entry in synergy_entries:
+                    referenced.add(entry["card1"]["name"])
+                    referenced.add(entry["card2"]["name"])
+            cards = load_cards(BULK_FILE, referenced)
+            card_lookup = {card["name"]: card for card in cards}
+
+        self.report_load(60, "Building the pair queue")
+        if db is not None:
+            stats = db.stats()
+            # Only an annotator's own labels are outside the database
+            candidates = [
+                (i, key)
+                for i, key in db.queue_pairs(ignore_annotated=annotator is not None)
+                if not any(v is not None for v in journal_updates.get(key, {}).values())
+            ]
+        else:
+            precomputed = None
+            if annotator is None:
+                # The queue file reflects the merged labels
+                precomputed = load_queue(queue_file_name(), SYNERGY_FILE)
+            if annotator is not None:
+                queue, stats = build_queue(synergy_entries)
+            elif precomputed is None:
+                queue, stats = build_queue(synergy_entries)
+                save_queue(queue, stats, SYNERGY_FILE, queue_file_name())
+            else:
+                print("Using precomputed queue", queue_file_name())
+                queue, stats = precomputed
+            # Journal labels are not in the queue file yet
+            if isinstance(synergy_entries, PairTable):
+                queue = np.frombuffer(queue, dtype=np.uint32)
+                queue = queue[~synergy_entries.labeled_mask()[queue]]
+                candidates = [(i, synergy_entries.pair_id(i)) for i in queue.tolist()]
+            else:
+                candidates = [
+                    (i, pair_id(synergy_entries[i]))
+                    for i in queue
+                    if not is_labeled(synergy_entries[i])
+                ]
+        # Before sharding: the pairs of the other shards are not labeled
+        labeled = stats["entries"] - len(candidates)
+        candidates = [c for c in candidates if in_shard(c[1], shards, shard)]
+        positions = [i for i, _ in candidates]
+        print("synergy entries length:", stats["entries"])
+
+        self.report_load(80, "Ordering the queue")
+        ranker = None
+        if QUEUE_ORDER == "random":
+            random.shuffle(positions)
+        elif QUEUE_ORDER == "clustered":
+            positions = cluster_order(candidates)
+        elif QUEUE_ORDER == "priority":
+            if db is not None:
+                ranked_entries = db.priority_entries(
+                    ignore_annotated=annotator is not None
+                )
+                apply_updates(ranked_entries, journal_updates)
+                ranker = PriorityRanker(ranked_entries)
+            else:
+                ranker = PriorityRanker(synergy_entries)
+            positions = ranker.rank(positions).tolist()
+        self.report_load(100, "Ready")
+        return {
+            "journal": journal,
+            "db": db,
+            "synergy_entries": synergy_entries,
+            "card_lookup": card_lookup,
+            "entries_count": stats["entries"],
+            "labeled_count": labeled,
+            "queue_positions": positions,
+            "ranker": ranker,
+            "journal_updates": journal_updates,
+            "merge_due": merge_due,
+        }
+
+    def data_loaded(self, future):
+        try:
+            data = future.result()
+        except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+            self.load_label.config(text=f"Loading failed: {e}")
+            print(f"Loading failed: {e}")
+            return
+        self.journal = data["journal"]
+        self.db = data["db"]
+        self.synergy_entries = data["synergy_entries"]
+        self.card_lookup = data["card_lookup"]
+        self.entries_count = data["entries_count"]
+        self.ranker = data["ranker"]
+        self.queue_positions = data["queue_positions"]
+        self.synergies_without_manual = QueueView(
+            self.queue_positions, self.synergy_entries
+        )
+        self.already_labeled_number = data["labeled_count"]
+        self.loaded = True
+        self.load_frame.pack_forget()
+        if data["merge_due"]:
+            self.io.submit(
+                "disk",
+                self.fold_journal,
+                data["journal_updates"],
+                callback=self.journal_folded,
+            )
         self.display_current_pair()
+        elapsed = time.perf_counter() - self.started
+        TIMINGS.record("time_to_first_pair", elapsed)
+        print(f"First pair shown {elapsed:.2f}s after start")
+
+        # Suggestions are not needed for the first pair
+        self.card_names = list(self.card_lookup.keys())
+        self.io.submit(
+            "index", CardNameIndex, self.card_names, callback=self.name_index_ready
+        )
+
+    def name_index_ready(self, future):
+        self.name_index = future.result()
 
     def merge_synergies_files(self):
         """
-        Merges the synergies.json file with the synergies_tmp.json file.
-        This is useful for saving progress without losing existing entries.
+        Compacts the label journal (synergies_tmp.jsonl) and returns the label
+        updates it holds, plus whether there are enough of them (MERGE_THRESHOLD
+        events) to fold them into the synergies file with fold_journal.
         """
-        if not os.path.exists(self.synergy_file_tmp):
+        updates = {}
+        if self.annotator is None:
+            updates = legacy_tmp_updates(self.synergy_file_tmp_legacy)
+        records = list(read_journal(self.synergy_file_tmp))
+        for key, fields in replay_journal(records).items():
+            updates.setdefault(key, {}).update(fields)
+        if not updates:
             print("No TMP FILE")
-            return
-        synergies_tmp = load_json(self.synergy_file_tmp)
-        synergies = load_json(SYNERGY_FILE)
+            return {}, False
 
-        # Merge synergies, avoiding duplicates
-        existing_synergies = {
-            f"{entry['card1']}_{entry['card2']}": entry for entry in synergies
-        }
-        for entry in synergies_tmp:
-            key = f"{entry['card1']}_{entry['card2']}"
-            if key in existing_synergies:
-                if entry.get("synergy_manual") is not None:
-                    existing_synergies[key]["synergy_manual"] = entry["synergy_manual"]
-                if entry.get("similarity") is not None:
-                    existing_synergies[key]["similarity"] = entry["similarity"]
-        merged_synergies = list(existing_synergies.values())
-        save_json(merged_synergies, SYNERGY_FILE)
-
-        open(self.synergy_file_tmp, "w").close()
+        write_journal(updates, self.synergy_file_tmp, self.annotator)
+        if self.annotator is not None:
+            # Other annotators may be rewriting the synergies file's neighbours
+            return updates, False
+        if os.path.exists(self.synergy_file_tmp_legacy):
+            os.remove(self.synergy_file_tmp_legacy)
+        return updates, len(records) >= MERGE_THRESHOLD
+
+    def fold_journal(self, updates):
+        """
+        Runs on the disk lane, before any label of this session is journaled.
+        """
+        changed = merge_updates_into_file(updates, SYNERGY_FILE)
+        self.journal.reset()
+        return changed
+
+    def journal_folded(self, future):
+        try:
+            print(f"Merged {future.result()} labeled pairs into {SYNERGY_FILE}")
+        except (OSError, ValueError) as e:
+            # The journal still holds the labels, merging is retried next launch
+            print(f"Merging the journal into {SYNERGY_FILE} failed: {e}")
 
     def get_current_entry(self):
         entry = self.synergies_without_manual[self.current_ptr]
@@ -211,7 +2727,10 @@ class SynergyApp:
 
         return f"#{r:02x}{g:02x}{b:02x}"
 
+    @timed("display")
     def display_current_pair(self):
+        if not self.loaded:
+            return
         try:
             card1, card2, entry = self.get_current_entry()
         except IndexError:
@@ -225,62 +2744,23 @@ class SynergyApp:
             self.status_label.config(text="")
 
         for i, card in enumerate([card1, card2]):
-            img = load_or_download_image(card)
-            if img:
-                img = resize_image(img)
-                tk_img = ImageTk.PhotoImage(img)
-                self.image_labels[i].configure(image=tk_img)
-                self.image_labels[i].image = tk_img
-
-            layout = card.get("layout", "normal")
-            is_special = layout in [
-                "transform",
-                "modal_dfc",
-                "split",
-                "flip",
-                "adventure",
-            ]
-            text_lines = []
-            tags = card.get("tags_labels", [])
-            self.tag_boxes[i].config(state="normal")
-            self.tag_boxes[i].delete("1.0", tk.END)
-            if tags:
-                self.tag_boxes[i].insert(tk.END, "Tags: " + ", ".join(tags))
-            else:
-                self.tag_boxes[i].insert(tk.END, "No tags")
-            self.tag_boxes[i].config(state="disabled")
-
-            if is_special and "card_faces" in card:
-                for face in card["card_faces"]:
-                    name = face.get("name", "")
-                    type_line = face.get("type_line", "")
-                    oracle = face.get("oracle_text", "")
-                    power = face.get("power", "")
-                    toughness = face.get("toughness", "")
-                    pt = f"\nP/T: {power} / {toughness}" if power and toughness else ""
-
-                    line = f"{name}\n{type_line}\n{oracle}"
-                    line += pt
-                    text_lines.append(line)
-            else:
-                name = card.get("name", "")
-                type_line = card.get("type_line", "")
-                oracle = card.get("oracle_text", "")
-                power = card.get("power", "")
-                toughness = card.get("toughness", "")
-                pt = f"\nP/T: {power} / {toughness}" if power and toughness else ""
-
-                line = f"{name}\n{type_line}\n{oracle}"
-                line += pt
-                text_lines.append(line)
-
-            final_text = "\n----------\n".join(text_lines)
-            self.text_boxes[i].config(state="normal")
-            self.text_boxes[i].delete("1.0", tk.END)
-            self.text_boxes[i].insert(tk.END, final_text)
-            self.text_boxes[i].config(state="disabled")
-
-            self.text_vars[i].set(card["name"])
+            tk_img = self.prefetcher.get(card)
+            if (
+                self.shown_cards[i] != card["name"]
+                or self.shown_images[i] is not tk_img
+            ):
+                self.show_card_image(i, card["name"], tk_img)
+            # Also for an unchanged card: the search box may hold half-typed text
+            if self.text_vars[i].get() != card["name"]:
+                self.text_vars[i].set(card["name"])
+            if self.shown_cards[i] == card["name"]:
+                continue
+            self.shown_cards[i] = card["name"]
+
+            tags_text, final_text = self.card_texts(card)
+            with TIMINGS.stage("text_widgets"):
+                self.set_text(self.tag_boxes[i], tags_text)
+                self.set_text(self.text_boxes[i], final_text)
 
         pred = entry.get("synergy_predicted", None)
         manual = entry.get("synergy_manual", None)
@@ -312,123 +2792,254 @@ class SynergyApp:
         else:
             similar_str = f"{similar:.2f}"
 
-        self.info_label.config(
-            text=f"Predicted synergy: {pred} / EDHREC: {synergy_edhrec} / Synergy: {synergy}"
+        self.configure_if_changed(
+            self.info_label,
+            text=f"Predicted synergy: {pred} / EDHREC: {synergy_edhrec} / Synergy: {synergy}",
         )
-        self.manual_label.config(
-            text=f"Manual synergy: {manual_str} | Similarity: {similar_str}"
+        self.configure_if_changed(
+            self.manual_label,
+            text=f"Manual synergy: {manual_str} | Similarity: {similar_str}",
+            fg=self.synergy_color(manual),
         )
 
-        self.manual_label.config(fg=self.synergy_color(manual))
-
-        if manual is None:
-            # No synergy labeled yet: enable all buttons
-            for button_dict in self.buttons.values():
-                button_dict["button"].config(state="normal")
-        else:
-            # Disable the button with the current manual value,
-            # enable all others
-            for button_dict in self.buttons.values():
-                if button_dict["value"] == manual:
-                    button_dict["button"].config(state="disabled")
-                else:
-                    button_dict["button"].config(state="normal")
-
-        if similar is None:
-            # No similarity labeled yet: enable all buttons
-            for button_dict in self.buttons_similarity.values():
-                button_dict["button"].config(state="normal")
-        else:
-            # Disable the button with the current similarity value,
-            # enable all others
-            for button_dict in self.buttons_similarity.values():
-                if button_dict["value"] == similar:
-                    button_dict["button"].config(state="disabled")
-                else:
-                    button_dict["button"].config(state="normal")
-
-        # Back button enable only if not at first entry
-        self.back_btn.config(state="normal" if self.current_ptr > 0 else "disabled")
-        # Next button enable only if not at last entry
-        self.next_btn.config(
-            state=(
-                "normal"
-                if self.current_ptr < len(self.synergies_without_manual) - 1
-                else "disabled"
+        # Disable the button with the current value, enable all others
+        for button_dict in self.buttons.values():
+            current = manual is not None and button_dict["value"] == manual
+            self.configure_if_changed(
+                button_dict["button"], state="disabled" if current else "normal"
             )
+        for button_dict in self.buttons_similarity.values():
+            current = similar is not None and button_dict["value"] == similar
+            self.configure_if_changed(
+                button_dict["button"], state="disabled" if current else "normal"
+            )
+
+        # Back/Next enabled only if there is a pair to go to
+        has_back = self.step_ptr(self.current_ptr, -1) is not None
+        has_next = self.step_ptr(self.current_ptr, 1) is not None
+        self.configure_if_changed(
+            self.back_btn, state="normal" if has_back else "disabled"
+        )
+        self.configure_if_changed(
+            self.next_btn, state="normal" if has_next else "disabled"
         )
 
-        self.number_entry_label.config(
-            text=f"Entry {self.current_ptr + 1} / {len(self.synergies_without_manual)}"
+        self.configure_if_changed(
+            self.number_entry_label,
+            text=f"Entry {self.current_ptr + 1} / {len(self.synergies_without_manual)}",
         )
 
-        self.labeled_number_label.config(
-            text=f"Labeled pairs: {self.already_labeled_number} / {len(self.synergy_entries)}"
+        self.configure_if_changed(
+            self.labeled_number_label,
+            text=(
+                f"Labeled pairs: {self.already_labeled_number} / {self.entries_count}"
+                f" ({len(self.session.labeled)} this session)"
+            ),
         )
 
+        self.prefetch_upcoming()
+
+    def configure_if_changed(self, widget, **options):
+        """
+        widget.config() with only the options that differ from the last call.
+        """
+        last = self.widget_options.setdefault(str(widget), {})
+        changed = {k: v for k, v in options.items() if last.get(k) != v}
+        if changed:
+            widget.config(**changed)
+            last.update(changed)
+
+    def set_text(self, box, text):
+        last = self.widget_options.setdefault(str(box), {})
+        if last.get("content") == text:
+            return
+        box.config(state="normal")
+        box.delete("1.0", tk.END)
+        box.insert(tk.END, text)
+        box.config(state="disabled")
+        last["content"] = text
+
+    def card_texts(self, card):
+        """
+        (tags text, rules text) shown for a card, rendered once per card.
+        """
+        name = card["name"]
+        if name in self.rendered_texts:
+            return self.rendered_texts[name]
+        if len(self.rendered_texts) >= 4096:
+            self.rendered_texts.clear()
+
+        tags = card.get("tags_labels", [])
+        tags_text = "Tags: " + ", ".join(tags) if tags else "No tags"
+        final_text = card_rules_text(card)
+        self.rendered_texts[name] = (tags_text, final_text)
+        return tags_text, final_text
+
+    def show_card_image(self, side, name, tk_img):
+        if tk_img is None:
+            self.image_labels[side].configure(image="", text=f"Loading {name}...")
+            self.image_wait_start[side] = time.perf_counter()
+        else:
+            self.image_labels[side].configure(image=tk_img, text="")
+            if self.image_wait_start[side] is not None:
+                # How long the pair was shown without this image
+                wait = time.perf_counter() - self.image_wait_start[side]
+                TIMINGS.record("image_wait", wait)
+                self.image_wait_start[side] = None
+        self.image_labels[side].image = tk_img
+        self.shown_images[side] = tk_img
+
+    def image_ready(self, name):
+        try:
+            card1, card2, _ = self.get_current_entry()
+        except IndexError:
+            return
+        for side, card in enumerate([card1, card2]):
+            if card and card["name"] == name:
+                self.show_card_image(side, name, self.prefetcher.ready[name])
+
+    def toggle_timings_overlay(self, event=None):
+        if self.overlay_refresh is not None:
+            self.root.after_cancel(self.overlay_refresh)
+            self.overlay_refresh = None
+        self.overlay_visible = not self.overlay_visible
+        if not self.overlay_visible:
+            self.timings_overlay.place_forget()
+            return
+        self.timings_overlay.place(relx=1.0, y=0, anchor="ne")
+        self.refresh_timings_overlay()
+
+    def refresh_timings_overlay(self):
+        self.overlay_refresh = None
+        if not self.overlay_visible:
+            return
+        lines = [f"{'stage':<15}{'n':>7}{'p50':>8}{'p95':>8}{'p99':>8}  (ms)"]
+        for stage, row in sorted(TIMINGS.summary().items()):
+            lines.append(
+                f"{stage:<15}{row['count']:>7}{row['p50_ms']:>8.1f}"
+                f"{row['p95_ms']:>8.1f}{row['p99_ms']:>8.1f}"
+            )
+        self.timings_overlay.config(text="\n".join(lines))
+        self.overlay_refresh = self.root.after(500, self.refresh_timings_overlay)
+
+    def show_io_status(self, pending):
+        parts = []
+        if pending["disk"]:
+            parts.append(f"Saving: {pending['disk']}")
+        if pending["images"]:
+            parts.append(f"Loading images: {pending['images']}")
+        self.io_status_label.config(text=" | ".join(parts))
+
+    def prefetch_upcoming(self):
+        """
+        Warm the images of the previous pair and the next PREFETCH_DEPTH pairs
+        (the next unlabeled ones in rapid mode).
+        """
+        entries = []
+        if self.current_ptr > 0:
+            entries.append(self.synergies_without_manual[self.current_ptr - 1])
+        ptr = self.current_ptr
+        while ptr is not None and len(entries) <= PREFETCH_DEPTH + 1:
+            entries.append(self.synergies_without_manual[ptr])
+            ptr = self.step_ptr(ptr, 1)
+        cards = []
+        for entry in entries:
+            for side in ["card1", "card2"]:
+                card = self.card_lookup.get(entry[side]["name"])
+                if card:
+                    cards.append(card)
+        self.prefetcher.prefetch(cards)
+
+    @timed("label_click")
     def label_similarity(self, value):
         """
         Label the similarity of the current synergy pair.
         """
-        if (
-            self.synergies_without_manual[self.current_ptr].get("similarity", None)
-            is None
-            and self.synergies_without_manual[self.current_ptr].get(
-                "synergy_manual", None
-            )
-            is None
-        ):
-            self.synergies_without_manual[self.current_ptr]["similarity"] = value
-            self.already_labeled_number += 1
-            self.synergies_labeled_this_session.append(
-                self.synergies_without_manual[self.current_ptr]
-            )
-        else:
-            self.synergies_without_manual[self.current_ptr]["similarity"] = value
-            for i in range(len(self.synergies_labeled_this_session)):
-                synergy_i = self.synergies_labeled_this_session[i]
-                if (
-                    synergy_i["card1"]["name"]
-                    == self.synergies_without_manual[self.current_ptr]["card1"]["name"]
-                    and synergy_i["card2"]["name"]
-                    == self.synergies_without_manual[self.current_ptr]["card2"]["name"]
-                ):
-                    self.synergies_labeled_this_session[i] = (
-                        self.synergies_without_manual[self.current_ptr]
-                    )
-
-        save_json(self.synergies_labeled_this_session, self.synergy_file_tmp)
-        self.display_current_pair()
+        self.label_current("similarity", value)
+        self.after_label()
 
+    @timed("label_click")
     def label_synergy(self, value):
+        self.label_current("synergy_manual", value)
+        self.after_label()
+
+    def after_label(self):
+        if self.rapid_mode.get():
+            ptr = self.step_ptr(self.current_ptr, 1)
+            if ptr is not None:
+                self.current_ptr = ptr
+        self.display_current_pair()  # refresh UI buttons etc.
 
-        if (
-            self.synergies_without_manual[self.current_ptr].get("synergy_manual", None)
-            is None
-            and self.synergies_without_manual[self.current_ptr].get("similarity", None)
-            is None
-        ):
-            self.synergies_without_manual[self.current_ptr]["synergy_manual"] = value
-            self.already_labeled_number += 1
-            self.synergies_labeled_this_session.append(
-                self.synergies_without_manual[self.current_ptr]
-            )
+    def label_current(self, field, value):
+        if not self.loaded:
+            return
+        entry = self.synergies_without_manual[self.current_ptr]
+        self.session.record(self.current_ptr, entry, field, entry.get(field), value)
+        self.set_label(self.current_ptr, entry, field, value)
+
+    def set_label(self, ptr, entry, field, value):
+        was_labeled = is_labeled(entry)
+        entry[field] = value
+        self.already_labeled_number += is_labeled(entry) - was_labeled
+        self.session.track(entry)
+        if self.db is not None and self.annotator is None:
+            self.io.submit("disk", self.db.set_label, *pair_id(entry), field, value)
         else:
-            self.synergies_without_manual[self.current_ptr]["synergy_manual"] = value
-            for i in range(len(self.synergies_labeled_this_session)):
-                synergy_i = self.synergies_labeled_this_session[i]
-                if (
-                    synergy_i["card1"]["name"]
-                    == self.synergies_without_manual[self.current_ptr]["card1"]["name"]
-                    and synergy_i["card2"]["name"]
-                    == self.synergies_without_manual[self.current_ptr]["card2"]["name"]
-                ):
-                    self.synergies_labeled_this_session[i] = (
-                        self.synergies_without_manual[self.current_ptr]
-                    )
-
-        save_json(self.synergies_labeled_this_session, self.synergy_file_tmp)
-        self.display_current_pair()  # refresh UI buttons etc.
+            self.io.submit("disk", self.journal.append, *pair_id(entry), field, value)
+
+        queue = self.synergies_without_manual
+        if self.ranker is not None and ptr < len(queue) and queue[ptr] is entry:
+            self.labeled_since_rank.append(self.queue_positions[ptr])
+            if len(self.labeled_since_rank) >= RERANK_EVERY:
+                self.rerank()
+
+    def rerank(self):
+        """
+        Re-rank the pairs after the current one with the latest label coverage,
+        on the "index" lane. Labels made meanwhile wait for the next rerank.
+        """
+        if self.rerank_job is not None:
+            return
+        for position in self.labeled_since_rank:
+            entry = self.synergy_entries[position]
+            self.ranker.set_labeled(position, is_labeled(entry))
+        self.labeled_since_rank = []
+        positions = self.queue_positions
+        start = self.current_ptr + 1
+        self.rerank_job = self.io.submit(
+            "index",
+            self.ranker.rank,
+            positions[start:],
+            callback=lambda future: self.reranked(future, positions, start),
+        )
+
+    def reranked(self, future, positions, start):
+        self.rerank_job = None
+        ranked = future.result().tolist()
+        if positions is not self.queue_positions:
+            return  # a filter replaced the queue
+        # Pairs reached while ranking keep their place
+        cut = max(start, self.current_ptr + 1)
+        reached = set(positions[start:cut])
+        positions[cut:] = [p for p in ranked if p not in reached]
+
+    def undo_label(self, event=None):
+        self.restore_label(self.session.undo())
+
+    def redo_label(self, event=None):
+        self.restore_label(self.session.redo())
+
+    def restore_label(self, step):
+        if step is None:
+            self.status_label.config(text="Nothing to undo/redo")
+            return
+        ptr, entry, field, value = step
+        self.set_label(ptr, entry, field, value)
+        # Show the pair the change belongs to
+        if ptr < len(self.synergies_without_manual):
+            if self.synergies_without_manual[ptr] is entry:
+                self.current_ptr = ptr
+        self.display_current_pair()
 
     def jump_to_synergy(self):
         val = self.jump_var.get()
@@ -444,17 +3055,138 @@ class SynergyApp:
         except ValueError:
             self.status_label.config(text="Please enter a valid integer")
 
-    def go_next(self):
-        if self.current_ptr < len(self.synergies_without_manual) - 1:
-            self.current_ptr += 1
+    def set_queue(self, positions, ptr=0):
+        self.queue_positions = positions
+        self.synergies_without_manual = QueueView(positions, self.synergy_entries)
+        self.current_ptr = ptr
+        self.display_current_pair()
+
+    def apply_filter(self, event=None):
+        """
+        Narrow the queue to the pairs matching the filter box, in queue order.
+        """
+        text = self.filter_var.get().strip()
+        if not self.loaded:
+            return
+        if not text:
+            self.clear_filter()
+            return
+        if self.pair_filter is None:
+            self.status_label.config(text="Building the filter index...")
+        start = time.perf_counter()
+        self.io.submit(
+            "index",
+            self.query_filter,
+            text,
+            callback=lambda future: self.filter_ready(future, text, start),
+        )
+
+    def query_filter(self, text):
+        """
+        Runs on the "index" lane, so building the PairFilterIndex on the first
+        query does not block the UI.
+        """
+        if self.pair_filter is None:
+            if isinstance(self.synergy_entries, PairTable):
+                pair_filter = PairFilterIndex.from_table(self.synergy_entries)
+            elif self.db is not None:
+                pair_filter = PairFilterIndex.from_pairs(self.db.pair_names())
+            else:
+                pair_filter = PairFilterIndex.from_pairs(
+                    (i, pair_id(e)) for i, e in enumerate(self.synergy_entries)
+                )
+            pair_filter.build_terms(self.card_lookup)
+            self.pair_filter = pair_filter
+        return self.pair_filter.query(text, self.card_lookup)
+
+    def filter_ready(self, future, text, start):
+        try:
+            matched = future.result()
+        except ValueError as e:
+            self.status_label.config(text=str(e))
+            return
+        if text != self.filter_var.get().strip():
+            return  # the box changed, its own query is on the way
+        if self.filter_base is None:
+            self.filter_base = (np.array(self.queue_positions), self.current_ptr)
+        base = self.filter_base[0]
+        # The index covers every pair, so positions run 0 .. len - 1
+        lookup = np.zeros(len(self.pair_filter.positions), dtype=bool)
+        lookup[matched] = True
+        positions = base[lookup[base]].tolist()
+        self.set_queue(positions)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.status_label.config(
+            text=f"{len(positions)} pairs match {text!r} ({elapsed_ms:.0f} ms)"
+        )
+
+    def clear_filter(self, event=None):
+        self.filter_var.set("")
+        if self.filter_base is None:
+            return
+        positions, ptr = self.filter_base
+        self.filter_base = None
+        self.set_queue(positions.tolist(), ptr)
+        self.status_label.config(text="Filter cleared")
+
+    def step_ptr(self, ptr, step):
+        """
+        Next position from `ptr` in direction `step`, None past either end.
+        In rapid mode, going forward skips labeled pairs; going back does not,
+        so the previous label can still be corrected.
+        """
+        ptr += step
+        while 0 <= ptr < len(self.synergies_without_manual):
+            if step < 0 or not self.rapid_mode.get():
+                return ptr
+            if not is_labeled(self.synergies_without_manual[ptr]):
+                return ptr
+            ptr += step
+        return None
+
+    def go_next(self, event=None):
+        ptr = self.step_ptr(self.current_ptr, 1)
+        if ptr is not None:
+            self.current_ptr = ptr
             self.display_current_pair()
 
-    def go_back(self):
-        if self.current_ptr > 0:
-            self.current_ptr -= 1
+    def go_back(self, event=None):
+        ptr = self.step_ptr(self.current_ptr, -1)
+        if ptr is not None:
+            self.current_ptr = ptr
             self.display_current_pair()
 
+    def typing(self, event):
+        return event.widget.winfo_class() in ("Entry", "TEntry", "TCombobox")
+
+    def on_label_key(self, event, label, value):
+        if self.typing(event):
+            return
+        label(value)
+
+    def on_nav_key(self, event, navigate):
+        if self.typing(event):
+            return
+        navigate()
+
+    def toggle_rapid_mode(self, event=None):
+        self.rapid_mode.set(not self.rapid_mode.get())
+        self.display_current_pair()
+
     def setup_ui(self):
+        # Startup progress, removed once the first pair can be shown
+        self.load_frame = tk.Frame(self.root, bg="#f0f0f0")
+        self.load_frame.pack(fill="x", padx=s(10), pady=s(5))
+        self.load_label = tk.Label(
+            self.load_frame,
+            text="Loading",
+            font=sf(("Arial", FONT_SIZE)),
+            bg="#f0f0f0",
+        )
+        self.load_label.pack(side="left")
+        self.load_bar = ttk.Progressbar(self.load_frame, maximum=100)
+        self.load_bar.pack(side="left", fill="x", expand=True, padx=s(10))
+
         self.card_frames = []
         self.image_labels = []
         self.text_boxes = []
@@ -634,6 +3366,70 @@ class SynergyApp:
         )
         jump_btn.pack(side="left", padx=(5, 0))
 
+        # Filter queries, e.g. "tag:sacrifice-outlet" or
+        # "type:creature & type:enchantment"
+        filter_frame = tk.Frame(button_frame, bg="#f0f0f0")
+        filter_frame.pack(side="left", padx=s(5))
+
+        self.filter_var = tk.StringVar()
+        filter_entry = tk.Entry(
+            filter_frame,
+            textvariable=self.filter_var,
+            width=30,
+            font=sf(("Noto Sans Inscriptional Pahlavi", FONT_SIZE)),
+        )
+        filter_entry.pack(side="left")
+        filter_entry.bind("<Return>", self.apply_filter)
+        filter_entry.bind("<Escape>", self.clear_filter)
+
+        filter_btn = tk.Button(
+            filter_frame,
+            text="Filter",
+            command=self.apply_filter,
+            font=sf(("Noto Sans Inscriptional Pahlavi", FONT_SIZE)),
+        )
+        filter_btn.pack(side="left", padx=(5, 0))
+        clear_btn = tk.Button(
+            filter_frame,
+            text="Clear",
+            command=self.clear_filter,
+            font=sf(("Noto Sans Inscriptional Pahlavi", FONT_SIZE)),
+        )
+        clear_btn.pack(side="left", padx=(5, 0))
+
+        # Keyboard labeling: keys follow the button order
+        self.rapid_mode = tk.BooleanVar(value=RAPID_MODE)
+        rapid_check = tk.Checkbutton(
+            button_frame,
+            text=(
+                f"Rapid mode (F2): {SYNERGY_KEYS[0]}-{SYNERGY_KEYS[-1]} synergy, "
+                f"{'/'.join(k.upper() for k in SIMILARITY_KEYS)} similarity, "
+                "arrows navigate, Next skips labeled pairs"
+            ),
+            variable=self.rapid_mode,
+            command=self.display_current_pair,
+            font=sf(("Arial", FONT_SIZE)),
+            bg="#f0f0f0",
+        )
+        rapid_check.pack(side="right", padx=s(5))
+        for key, button_dict in zip(SYNERGY_KEYS, self.buttons.values()):
+            self.root.bind(
+                key,
+                lambda e, v=button_dict["value"]: self.on_label_key(
+                    e, self.label_synergy, v
+                ),
+            )
+        for key, button_dict in zip(SIMILARITY_KEYS, self.buttons_similarity.values()):
+            self.root.bind(
+                key,
+                lambda e, v=button_dict["value"]: self.on_label_key(
+                    e, self.label_similarity, v
+                ),
+            )
+        self.root.bind("<Right>", lambda e: self.on_nav_key(e, self.go_next))
+        self.root.bind("<Left>", lambda e: self.on_nav_key(e, self.go_back))
+        self.root.bind("<F2>", self.toggle_rapid_mode)
+
         self.status_label = tk.Label(
             self.root,
             text="",
@@ -661,16 +3457,59 @@ class SynergyApp:
         )
         self.labeled_number_label.pack(pady=s(5))
 
+        self.io_status_label = tk.Label(
+            self.root,
+            text="",
+            font=sf(("Arial", FONT_SIZE - 1)),
+            fg="gray",
+            bg="#f0f0f0",
+        )
+        self.io_status_label.pack(pady=s(2))
+
+        # What is on screen, so display_current_pair only touches what changed
+        self.widget_options = {}
+        self.rendered_texts = {}
+        self.shown_cards = [None, None]
+        self.shown_images = [None, None]
+
+        # Stage latency overlay, toggled with F12
+        self.image_wait_start = [None, None]
+        self.timings_overlay = tk.Label(
+            self.root,
+            text="",
+            justify="left",
+            font=sf(("Courier", FONT_SIZE - 1)),
+            fg="white",
+            bg="#202020",
+        )
+        # place() only maps the label once Tk is idle, so winfo_ismapped()
+        # cannot tell whether the overlay is shown
+        self.overlay_visible = False
+        self.overlay_refresh = None  # after() ID of the pending refresh
+        self.root.bind("<F12>", self.toggle_timings_overlay)
+
+        self.root.bind("<Control-z>", self.undo_label)
+        self.root.bind("<Control-y>", self.redo_label)
+        self.root.bind("<Control-Z>", self.redo_label)  # Ctrl+Shift+Z
+
     def update_suggestions(self, event, index):
-        typed = self.text_vars[index].get().lower()
-        suggestions = [c["name"] for c in self.cards if typed in c["name"].lower()][:10]
-        self.search_boxes[index]["values"] = suggestions
+        # Debounced: only search once typing pauses
+        if self.suggestion_jobs[index] is not None:
+            self.root.after_cancel(self.suggestion_jobs[index])
+        self.suggestion_jobs[index] = self.root.after(
+            SUGGESTION_DEBOUNCE_MS, lambda: self.show_suggestions(index)
+        )
+
+    def show_suggestions(self, index):
+        self.suggestion_jobs[index] = None
+        typed = self.text_vars[index].get()
+        self.search_boxes[index]["values"] = self.name_index.search(typed)
 
     def replace_card(self, event, index):
         name = self.text_vars[index].get()
         match = self.card_lookup.get(name)
         if match:
-            entry = self.synergies_without_manual[self.current_index]
+            entry = self.synergies_without_manual[self.current_ptr]
             if index == 0:
                 entry["card1"]["name"] = name
             else:
@@ -678,7 +3517,387 @@ class SynergyApp:
             self.display_current_pair()
 
 
-if __name__ == "__main__":
+EXPORT_LABELS = ["synergy_manual", "similarity"]
+EXPORT_SCORES = ["synergy_predicted", "synergy_edhrec", "synergy"]
+EXPORT_CARDS = None  # CardStore of an export worker process
+
+
+def export_rows(entries, updates, labeled_only=True):
+    """
+    (card1, card2, *EXPORT_LABELS, *EXPORT_SCORES) per entry, journal updates
+    applied on the way.
+    """
+    for entry in entries:
+        fields = updates.get(pair_id(entry))
+        if fields:
+            entry.update(fields)
+        if labeled_only and not is_labeled(entry):
+            continue
+        yield (entry["card1"]["name"], entry["card2"]["name"]) + tuple(
+            entry.get(field) for field in EXPORT_LABELS + EXPORT_SCORES
+        )
+
+
+def init_export_worker(store_file):
+    global EXPORT_CARDS
+    EXPORT_CARDS = CardStore(store_file)
+
+
+def encode_strings(strings):
+    """
+    Strings as one UTF-8 byte array plus int64 offsets: string k is
+    data[offsets[k]:offsets[k + 1]]. A fixed-width unicode array would pad
+    every cell to the longest one, 4 bytes per character.
+    """
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(data, offsets):
+    raw = data.tobytes()
+    return [
+        raw[offsets[k] : offsets[k + 1]].decode("utf-8")
+        for k in range(len(offsets) - 1)
+    ]
+
+
+def export_shard(rows, path, fmt):
+    """
+    Join one shard of pairs with the card store (in a worker process) and write
+    it as columns: card names, type lines, rules text, tags, then labels and
+    scores as float32 with NaN for missing values. In .npz files the text
+    columns are stored with encode_strings (read back with decode_strings).
+    """
+    columns = {}
+    for side in (1, 2):
+        cards = [EXPORT_CARDS.get(row[side - 1]) or {} for row in rows]
+        columns[f"card{side}"] = [row[side - 1] for row in rows]
+        columns[f"card{side}_type"] = [
+            " // ".join(f.get("type_line", "") for f in card_text_faces(card))
+            for card in cards
+        ]
+        columns[f"card{side}_text"] = [
+            card_rules_text(card) if card else "" for card in cards
+        ]
+        columns[f"card{side}_tags"] = [card.get("tags_labels", []) for card in cards]
+    for i, field in enumerate(EXPORT_LABELS + EXPORT_SCORES, 2):
+        columns[field] = np.array(
+            [np.nan if row[i] is None else row[i] for row in rows], dtype=np.float32
+        )
+
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.table(columns), tmp_path)
+    else:
+        for side in (1, 2):
+            # Tags as one "|"-separated string per card: npz holds no lists
+            columns[f"card{side}_tags"] = [
+                "|".join(tags) for tags in columns[f"card{side}_tags"]
+            ]
+        arrays = {}
+        for name, column in columns.items():
+            if isinstance(column, np.ndarray):
+                arrays[name] = column
+            else:
+                arrays[name], arrays[name + "_offsets"] = encode_strings(column)
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+    return os.path.basename(path), len(rows)
+
+
+def export_labeled(
+    entries,
+    updates,
+    output_dir=EXPORT_DIR,
+    fmt=EXPORT_FORMAT,
+    shard_rows=EXPORT_SHARD_ROWS,
+    workers=EXPORT_WORKERS,
+    labeled_only=True,
+):
+    """
+    Write labeled pairs joined with their cards as columnar shards, one worker
+    process per core. Entries are streamed in shards of `shard_rows`, with at
+    most two shards per worker in flight. Returns the manifest.
+    """
+    if fmt not in ("npz", "parquet"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    # Build or refresh the store once; workers map the same file
+    open_card_store(BULK_FILE, CARD_STORE_FILE).close()
+    os.makedirs(output_dir, exist_ok=True)
+    shards = []
+    pending = set()
+    with ProcessPoolExecutor(
+        workers, initializer=init_export_worker, initargs=(CARD_STORE_FILE,)
+    ) as pool:
+
+        def collect(return_when):
+            nonlocal pending
+            done, pending = wait(pending, return_when=return_when)
+            shards.extend(future.result() for future in done)
+
+        rows = export_rows(entries, updates, labeled_only)
+        while True:
+            chunk = [row for _, row in zip(range(shard_rows), rows)]
+            if not chunk:
+                break
+            path = os.path.join(
+                output_dir, f"part-{len(shards) + len(pending):05d}.{fmt}"
+            )
+            pending.add(pool.submit(export_shard, chunk, path, fmt))
+            if len(pending) >= 2 * workers:
+                collect(FIRST_COMPLETED)
+        collect(ALL_COMPLETED)
+
+    shards.sort()
+    manifest = {
+        "format": fmt,
+        "rows": sum(n for _, n in shards),
+        "shards": [{"file": name, "rows": n} for name, n in shards],
+        "labels": EXPORT_LABELS,
+        "scores": EXPORT_SCORES,
+    }
+    if fmt == "npz":
+        manifest["strings"] = "utf-8 bytes + <name>_offsets, see decode_strings"
+    save_json(manifest, os.path.join(output_dir, "manifest.json"))
+    return manifest
+
+
+def alias_labels(file):
+    """
+    Labels of every labeled pair in a synergies file, as journal updates,
+    so that dropping an alias does not drop its label. The first alias
+    carrying a field wins.
+    """
+    updates = {}
+    for entry in iter_json_array(file):
+        for field in ["synergy_manual", "similarity"]:
+            if entry.get(field) is not None:
+                updates.setdefault(pair_id(entry), {}).setdefault(field, entry[field])
+    return updates
+
+
+def run_gui(args):
     root = tk.Tk()
-    app = SynergyApp(root)
+    app = SynergyApp(
+        root,
+        annotator=getattr(args, "annotator", ANNOTATOR_ID),
+        shards=getattr(args, "shards", ANNOTATOR_COUNT),
+        shard=getattr(args, "shard", ANNOTATOR_INDEX),
+    )
     root.mainloop()
+    app.io.shutdown()
+    if app.journal is not None:
+        app.journal.close()
+    TIMINGS.dump(TIMINGS_FILE)
+    print("Image cache:", IMAGE_MEMORY_CACHE.stats())
+    if isinstance(app.card_lookup, CardStore):
+        app.card_lookup.close()
+    if app.db is not None:
+        app.db.close()
+
+
+def run_queue(args):
+    """
+    Build the work queue without a display and report label coverage.
+    """
+    entries = load_json(args.synergy_file)
+    queue, _ = build_queue(entries)
+    stats = label_statistics(entries)
+    save_queue(queue, stats, args.synergy_file, args.output)
+    print(f"Wrote {len(queue)} unlabeled pairs to {args.output}")
+    print(json.dumps(stats, indent=2))
+
+
+def run_warm_cache(args):
+    """
+    Fill IMAGE_CACHE_DIR with the images of every card referenced by the pairs.
+    """
+    names = set()
+    for entry in iter_json_array(args.synergy_file):
+        names.update(pair_id(entry))
+    card_lookup = open_card_store(BULK_FILE)
+    try:
+        downloaded, failed = warm_image_cache(
+            card_lookup, sorted(names), workers=args.workers, rate=args.rate
+        )
+    finally:
+        card_lookup.close()
+    print(f"Downloaded {downloaded} images, {failed} failed")
+
+
+def run_gc_cache(args):
+    removed = image_disk_cache().gc(remove_legacy=args.remove_legacy)
+    print(f"Removed {removed} files from {IMAGE_CACHE_DIR}")
+
+
+def run_merge_annotators(args):
+    """
+    Combine every annotator journal into the synergies file and report agreement.
+    """
+    pattern = os.path.join(args.journal_dir, annotator_journal_file("*"))
+    journal_files = sorted(glob.glob(pattern))
+    if not journal_files:
+        print(f"No annotator journals matching {pattern}")
+        return
+    labels = merge_annotator_journals(journal_files)
+    changed = merge_updates_into_file(annotation_updates(labels), args.synergy_file)
+    stats = agreement_statistics(labels)
+    print(f"Merged {len(journal_files)} journals, {changed} pairs changed")
+    print(json.dumps(stats, indent=2))
+    if args.stats:
+        save_json(stats, args.stats)
+
+
+def run_db_import(args):
+    db = SynergyDB(args.db)
+    db.import_json(args.synergy_file)
+    print(f"Imported {args.synergy_file} into {args.db}:", db.stats())
+    db.close()
+
+
+def run_db_export(args):
+    db = SynergyDB(args.db)
+    db.export_json(args.output)
+    print(f"Exported {args.db} to {args.output}")
+    db.close()
+
+
+def run_export(args):
+    """
+    Export labeled pairs (with journal labels not folded yet) for training.
+    """
+    updates = replay_journal(read_journal(journal_base_name() + ".jsonl"))
+    if args.db:
+        db = SynergyDB(args.db)
+        entries = db.iter_entries()
+    else:
+        db = None
+        entries = iter_json_array(args.synergy_file)
+    start = time.perf_counter()
+    try:
+        manifest = export_labeled(
+            entries,
+            updates,
+            output_dir=args.output_dir,
+            fmt=args.format,
+            shard_rows=args.shard_rows,
+            workers=args.workers,
+            labeled_only=not args.all,
+        )
+    finally:
+        if db is not None:
+            db.close()
+    print(
+        f"Exported {manifest['rows']} pairs in {len(manifest['shards'])} shards "
+        f"to {args.output_dir} in {time.perf_counter() - start:.1f}s"
+    )
+
+
+def run_dedup(args):
+    """
+    Drop repeated and reversed pairs from the synergies file, keeping the
+    first alias of each pair with the labels of all of them.
+    """
+    removed = merge_updates_into_file(
+        alias_labels(args.synergy_file), args.synergy_file, dedup=True
+    )
+    print(f"Rewrote {args.synergy_file}: {removed} entries dropped or relabeled")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MTG Synergy Labeler")
+    commands = parser.add_subparsers(dest="command")
+    gui_parser = commands.add_parser("gui", help="label pairs (default)")
+    gui_parser.add_argument("--annotator", default=ANNOTATOR_ID)
+    gui_parser.add_argument("--shards", type=int, default=ANNOTATOR_COUNT)
+    gui_parser.add_argument("--shard", type=int, default=ANNOTATOR_INDEX)
+    queue_parser = commands.add_parser(
+        "queue", help="precompute the pair queue and print label statistics"
+    )
+    queue_parser.add_argument("--synergy-file", default=SYNERGY_FILE)
+    queue_parser.add_argument("--output", default=queue_file_name())
+    warm_parser = commands.add_parser(
+        "warm-cache", help="download the images of every card in the pairs"
+    )
+    warm_parser.add_argument("--synergy-file", default=SYNERGY_FILE)
+    warm_parser.add_argument("--workers", type=int, default=WARM_WORKERS)
+    warm_parser.add_argument(
+        "--rate", type=float, default=DOWNLOAD_RATE_LIMIT, help="requests per second"
+    )
+    gc_parser = commands.add_parser(
+        "gc-cache", help="compact the image cache manifest and delete orphans"
+    )
+    gc_parser.add_argument(
+        "--remove-legacy",
+        action="store_true",
+        help="also delete the old name-keyed PNGs",
+    )
+    annotators_parser = commands.add_parser(
+        "merge-annotators",
+        help="merge every annotator journal and print agreement statistics",
+    )
+    annotators_parser.add_argument("--journal-dir", default=".")
+    annotators_parser.add_argument("--synergy-file", default=SYNERGY_FILE)
+    annotators_parser.add_argument("--stats", help="also save the statistics here")
+    import_parser = commands.add_parser(
+        "db-import", help="(re)load the SQLite store from a synergies JSON file"
+    )
+    import_parser.add_argument("--synergy-file", default=SYNERGY_FILE)
+    import_parser.add_argument("--db", default=SYNERGY_DB)
+    export_parser = commands.add_parser(
+        "db-export", help="write the SQLite store back as synergies JSON"
+    )
+    export_parser.add_argument("--db", default=SYNERGY_DB)
+    export_parser.add_argument("--output", default=SYNERGY_FILE)
+    export_cmd = commands.add_parser(
+        "export", help="write labeled pairs with card text as training shards"
+    )
+    export_cmd.add_argument("--synergy-file", default=SYNERGY_FILE)
+    export_cmd.add_argument(
+        "--db",
+        default=SYNERGY_DB if STORAGE_BACKEND == "sqlite" else None,
+        help="read the pairs from this SQLite store instead",
+    )
+    export_cmd.add_argument("--output-dir", default=EXPORT_DIR)
+    export_cmd.add_argument(
+        "--format", choices=["npz", "parquet"], default=EXPORT_FORMAT
+    )
+    export_cmd.add_argument("--shard-rows", type=int, default=EXPORT_SHARD_ROWS)
+    export_cmd.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    export_cmd.add_argument(
+        "--all", action="store_true", help="include unlabeled pairs"
+    )
+    dedup_parser = commands.add_parser(
+        "dedup", help="remove repeated and reversed pairs from the synergies file"
+    )
+    dedup_parser.add_argument("--synergy-file", default=SYNERGY_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == "queue":
+        run_queue(args)
+    elif args.command == "warm-cache":
+        run_warm_cache(args)
+    elif args.command == "gc-cache":
+        run_gc_cache(args)
+    elif args.command == "merge-annotators":
+        run_merge_annotators(args)
+    elif args.command == "db-import":
+        run_db_import(args)
+    elif args.command == "db-export":
+        run_db_export(args)
+    elif args.command == "export":
+        run_export(args)
+    elif args.command == "dedup":
+        run_dedup(args)
+    else:
+        run_gui(args)
+
+
+if __name__ == "__main__":
+    main()
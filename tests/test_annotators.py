@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import synergy_labeler_2 as labeler
+
+
+def entry(card1, card2, **fields):
+    return {"card1": {"name": card1}, "card2": {"name": card2}, **fields}
+
+
+ENTRIES = [
+    entry("A", "B", synergy_manual=1.0),  # labeled before the annotators
+    entry("A", "C", similarity=0.0),  # labeled before the annotators
+    entry(
+        "A",
+        "D",
+        synergy_manual=0.5,
+        annotations=[
+            {"annotator": "alice", "synergy_manual": 1.0},
+            {"annotator": "bob", "synergy_manual": 0.0},
+        ],
+    ),
+    entry("B", "C"),
+    entry("B", "D"),
+]
+
+
+def test_annotator_journals_merge_per_annotator(tmp_path):
+    alice = str(tmp_path / "alice.jsonl")
+    bob = str(tmp_path / "bob.jsonl")
+    labeler.write_journal({("A", "B"): {"synergy_manual": 1.0}}, alice, "alice")
+    labeler.write_journal({("A", "B"): {"synergy_manual": 0.0}}, bob, "bob")
+
+    labels = labeler.merge_annotator_journals([alice, bob])
+    updates = labeler.annotation_updates(labels)
+
+    assert labels == {
+        ("A", "B"): {"alice": {"synergy_manual": 1.0}, "bob": {"synergy_manual": 0.0}}
+    }
+    assert updates[("A", "B")]["synergy_manual"] == 0.5
+    assert updates[("A", "B")]["annotations"] == [
+        {"annotator": "alice", "synergy_manual": 1.0},
+        {"annotator": "bob", "synergy_manual": 0.0},
+    ]
+
+
+@pytest.fixture(params=["table", "dicts", "sqlite"])
+def load(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "synergies.json").write_text(json.dumps(ENTRIES), encoding="utf-8")
+    cards = [{"name": name} for name in "ABCD"]
+    (tmp_path / "cards.json").write_text(json.dumps(cards), encoding="utf-8")
+    monkeypatch.setattr(labeler, "SYNERGY_FILE", "synergies.json")
+    monkeypatch.setattr(labeler, "BULK_FILE", "cards.json")
+    monkeypatch.setattr(labeler, "USE_CARD_STORE", False)
+    monkeypatch.setattr(labeler, "QUEUE_ORDER", "file")
+    monkeypatch.setattr(labeler, "COMPACT_ENTRIES", request.param == "table")
+    if request.param == "sqlite":
+        monkeypatch.setattr(labeler, "STORAGE_BACKEND", "sqlite")
+        monkeypatch.setattr(labeler, "SYNERGY_DB", "synergies.sqlite3")
+    opened = []
+
+    def load(annotator):
+        app = labeler.SynergyApp.__new__(labeler.SynergyApp)
+        app.annotator = annotator
+        if annotator is None:
+            app.synergy_file_tmp = labeler.journal_base_name() + ".jsonl"
+        else:
+            app.synergy_file_tmp = labeler.annotator_journal_file(annotator)
+        app.synergy_file_tmp_legacy = labeler.journal_base_name() + ".json"
+        data = app.load_data(annotator, 1, 0)
+        opened.append(data)
+        return data["queue_positions"], data["labeled_count"], data["entries_count"]
+
+    yield load
+    for data in opened:
+        data["journal"].close()
+        if data["db"] is not None:
+            data["db"].close()
+
+
+def test_main_labeler_counts_merged_labels(load):
+    assert load(None) == ([3, 4], 3, 5)
+
+
+def test_annotator_keeps_labels_from_before_the_annotators(load):
+    # Only the annotated pair's mean label is dropped
+    assert load("carol") == ([2, 3, 4], 2, 5)
+
+
+def test_annotator_own_journal_labels_the_annotated_pair(load):
+    labeler.write_journal(
+        {("A", "D"): {"synergy_manual": 1.0}},
+        labeler.annotator_journal_file("alice"),
+        "alice",
+    )
+    assert load("alice") == ([3, 4], 3, 5)
+    assert load("bob") == ([2, 3, 4], 2, 5)
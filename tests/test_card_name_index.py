@@ -0,0 +1,58 @@
+import synergy_labeler_2 as labeler
+
+NAMES = [
+    "Lightning Bolt",
+    "Lightning Helix",
+    "Lightning Greaves",
+    "Chain Lightning",
+    "Bolt Bend",
+    "Boltwave",
+    "Fire // Ice",
+    "Sol Ring",
+]
+
+
+def search(query, limit=labeler.SUGGESTION_LIMIT):
+    return labeler.CardNameIndex(NAMES).search(query, limit)
+
+
+def test_name_prefix_comes_first():
+    assert search("Lightning", limit=3) == [
+        "Lightning Bolt",
+        "Lightning Greaves",
+        "Lightning Helix",
+    ]
+
+
+def test_word_prefix_after_name_prefix():
+    assert search("bolt") == ["Bolt Bend", "Boltwave", "Lightning Bolt"]
+    assert search("helix") == ["Lightning Helix"]
+
+
+def test_substring_inside_a_word():
+    assert search("ghtn") == [
+        "Chain Lightning",
+        "Lightning Bolt",
+        "Lightning Greaves",
+        "Lightning Helix",
+    ]
+
+
+def test_short_queries_match_inside_words():
+    assert search("x") == ["Lightning Helix"]
+    assert search("ix") == ["Lightning Helix"]
+    assert search("//") == ["Fire // Ice"]
+
+
+def test_short_query_scan_stops_at_the_limit():
+    assert len(search("i", limit=2)) == 2
+
+
+def test_typo_tolerant_match():
+    assert search("lightnig bolt")[0] == "Lightning Bolt"
+
+
+def test_limit_and_empty_query():
+    assert len(search("l", limit=3)) == 3
+    assert search("  ") == []
+    assert search("zzzz") == []
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+import synergy_labeler_2 as labeler
+
+CARDS = [
+    {"name": "Lightning Bolt", "type_line": "Instant", "prices": {"usd": "1"}},
+    {
+        "name": "Fire // Ice",
+        "layout": "split",
+        "card_faces": [
+            {"name": "Fire", "oracle_text": "Deal 2", "artist": "x"},
+            {"name": "Ice", "oracle_text": "Tap", "artist": "y"},
+        ],
+    },
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    file = tmp_path / "cards.json"
+    file.write_text(json.dumps(CARDS), encoding="utf-8")
+    return str(file)
+
+
+def open_store(source):
+    return labeler.open_card_store(source, store_file=source + ".store")
+
+
+def test_store_holds_projected_cards(source):
+    store = open_store(source)
+    try:
+        assert len(store) == 2
+        assert "Lightning Bolt" in store
+        assert store["Lightning Bolt"] == labeler.project_card(CARDS[0])
+        assert "prices" not in store["Lightning Bolt"]
+        assert store["Fire // Ice"]["card_faces"][0] == {
+            "name": "Fire",
+            "oracle_text": "Deal 2",
+        }
+        assert store.get("Missing") is None
+    finally:
+        store.close()
+    assert not [f for f in os.listdir(os.path.dirname(source)) if f.endswith(".tmp")]
+
+
+def test_touched_source_with_same_content_is_not_rebuilt(source, monkeypatch):
+    open_store(source).close()
+    st = os.stat(source)
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    builds = []
+    monkeypatch.setattr(labeler, "build_card_store", lambda *a: builds.append(a))
+
+    store = open_store(source)
+    try:
+        assert store.matches(source)
+        assert builds == []
+        assert store.source_mtime_ns == st.st_mtime_ns
+    finally:
+        store.close()
+    # The new mtime was recorded, the next check skips the hash
+    reopened = labeler.CardStore(source + ".store")
+    try:
+        assert reopened.source_mtime_ns == st.st_mtime_ns + 10**9
+    finally:
+        reopened.close()
+
+
+def test_changed_source_is_rebuilt(source):
+    open_store(source).close()
+    cards = CARDS + [{"name": "Opt", "type_line": "Instant"}]
+    with open(source, "w", encoding="utf-8") as f:
+        json.dump(cards, f)
+
+    store = open_store(source)
+    try:
+        assert "Opt" in store
+        assert len(store) == 3
+    finally:
+        store.close()
+
+
+def test_same_size_edit_is_detected_by_hash(source):
+    open_store(source).close()
+    with open(source, "r", encoding="utf-8") as f:
+        text = f.read()
+    with open(source, "w", encoding="utf-8") as f:
+        f.write(text.replace("Instant", "Sorcery"))
+
+    store = open_store(source)
+    try:
+        assert store["Lightning Bolt"]["type_line"] == "Sorcery"
+    finally:
+        store.close()
+
+
+def test_changed_fields_make_the_store_stale(source, monkeypatch):
+    open_store(source).close()
+    monkeypatch.setattr(labeler, "CARD_FIELDS", labeler.CARD_FIELDS + ["artist"])
+    store = labeler.CardStore(source + ".store")
+    try:
+        assert not store.matches(source)
+    finally:
+        store.close()
+
+
+def test_corrupt_store_is_rebuilt(source):
+    with open(source + ".store", "wb") as f:
+        f.write(b"garbage")
+    store = open_store(source)
+    try:
+        assert len(store) == 2
+    finally:
+        store.close()
@@ -0,0 +1,49 @@
+import random
+
+import synergy_labeler_2 as labeler
+
+
+def grid_pairs(cards=12):
+    names = [f"card{i}" for i in range(cards)]
+    pairs = [(a, b) for i, a in enumerate(names) for b in names[i + 1 :]]
+    return [(position * 3, pair) for position, pair in enumerate(pairs)]
+
+
+def shared_neighbours(order, pairs):
+    names = dict(pairs)
+    return sum(bool(set(names[a]) & set(names[b])) for a, b in zip(order, order[1:]))
+
+
+def test_every_position_once():
+    pairs = grid_pairs()
+    order = labeler.cluster_order(pairs, seed=1, block_size=5)
+    assert sorted(order) == sorted(position for position, _ in pairs)
+
+
+def test_same_seed_same_order():
+    pairs = grid_pairs()
+    assert labeler.cluster_order(pairs, seed=7) == labeler.cluster_order(pairs, seed=7)
+    assert labeler.cluster_order(pairs, seed=7) != labeler.cluster_order(pairs, seed=8)
+
+
+def test_block_size_one_is_the_shuffle():
+    pairs = grid_pairs()
+    shuffled = list(pairs)
+    random.Random(3).shuffle(shuffled)
+    order = labeler.cluster_order(pairs, seed=3, block_size=1)
+    assert order == [position for position, _ in shuffled]
+
+
+def test_consecutive_pairs_share_a_card():
+    pairs = grid_pairs()
+    clustered = labeler.cluster_order(pairs, seed=5, block_size=8)
+    shuffled = labeler.cluster_order(pairs, seed=5, block_size=1)
+    assert shared_neighbours(clustered, pairs) > shared_neighbours(shuffled, pairs)
+
+
+def test_pairs_of_a_card_with_itself_and_no_pairs():
+    assert labeler.cluster_order([(0, ("A", "A")), (1, ("A", "B"))], seed=0) in (
+        [0, 1],
+        [1, 0],
+    )
+    assert labeler.cluster_order([]) == []
@@ -0,0 +1,104 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+import requests
+from PIL import Image
+
+import synergy_labeler_2 as labeler
+
+
+def png_bytes():
+    buf = BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class Handler(BaseHTTPRequestHandler):
+    hits = {}
+    flaky_failures = 1
+
+    def do_GET(self):
+        hits = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == "/image.png":
+            self.reply(200, "image/png", png_bytes())
+        elif self.path == "/page.html":
+            self.reply(200, "text/html", b"<html>not found</html>")
+        elif self.path == "/broken.png":
+            self.reply(200, "image/png", b"not a png")
+        elif self.path == "/flaky.png" and hits <= self.flaky_failures:
+            self.reply(503, "text/plain", b"busy", {"Retry-After": "1"})
+        elif self.path == "/flaky.png":
+            self.reply(200, "image/png", png_bytes())
+        elif self.path == "/down.png":
+            self.reply(503, "text/plain", b"busy")
+        else:
+            self.reply(404, "text/plain", b"missing")
+
+    def reply(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(labeler, "DOWNLOAD_BACKOFF", 0.01)
+    Handler.hits = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def download(url, retries=labeler.DOWNLOAD_RETRIES):
+    return labeler.download_image(
+        url, retries=retries, rate_limiter=labeler.RateLimiter(0)
+    )
+
+
+def test_download_image(server):
+    img = download(server + "/image.png")
+    assert img.size == (4, 4)
+
+
+def test_404_is_not_retried(server):
+    with pytest.raises(requests.HTTPError):
+        download(server + "/missing.png")
+    assert Handler.hits["/missing.png"] == 1
+
+
+def test_non_image_content_type_raises(server):
+    with pytest.raises(ValueError):
+        download(server + "/page.html")
+    assert Handler.hits["/page.html"] == 1
+
+
+def test_corrupt_image_raises(server):
+    with pytest.raises(OSError):
+        download(server + "/broken.png")
+
+
+def test_503_waits_for_retry_after(server):
+    start = time.monotonic()
+    img = download(server + "/flaky.png")
+    assert img.size == (4, 4)
+    assert Handler.hits["/flaky.png"] == 2
+    assert time.monotonic() - start >= 1
+
+
+def test_503_gives_up_after_retries(server):
+    with pytest.raises(requests.HTTPError):
+        download(server + "/down.png", retries=2)
+    assert Handler.hits["/down.png"] == 3
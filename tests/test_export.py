@@ -0,0 +1,110 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import synergy_labeler_2 as labeler
+
+
+def entry(card1, card2, **fields):
+    return {"card1": {"name": card1}, "card2": {"name": card2}, **fields}
+
+
+CARDS = [
+    {"name": "Æther Vial", "type_line": "Artifact", "tags_labels": ["ramp", "aura"]},
+    {"name": "Fire // Ice", "type_line": "Instant", "oracle_text": "Zap"},
+    {"name": "Opt", "type_line": "Instant", "oracle_text": "Scry 1."},
+]
+ENTRIES = [
+    entry("Æther Vial", "Opt", synergy_manual=1.0, synergy_predicted=0.5),
+    entry("Opt", "Fire // Ice"),
+    entry("Fire // Ice", "Æther Vial", similarity=0.0, synergy_edhrec=0.25),
+    entry("Opt", "Missing Card", synergy_manual=0.0),
+]
+
+
+@pytest.mark.parametrize(
+    "strings", [[], [""], ["a", "", "Æther", "Fire // Ice", "日本語"], ["x" * 1000]]
+)
+def test_encode_strings_round_trip(strings):
+    data, offsets = labeler.encode_strings(strings)
+    assert data.dtype == np.uint8 and offsets.dtype == np.int64
+    assert len(offsets) == len(strings) + 1
+    assert labeler.decode_strings(data, offsets) == strings
+
+
+def test_encoded_strings_are_not_padded():
+    data, _ = labeler.encode_strings(["a", "b" * 100])
+    assert data.nbytes == 101
+
+
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    bulk = tmp_path / "cards.json"
+    bulk.write_text(json.dumps(CARDS), encoding="utf-8")
+    monkeypatch.setattr(labeler, "BULK_FILE", str(bulk))
+    monkeypatch.setattr(labeler, "CARD_STORE_FILE", str(bulk) + ".store")
+    output_dir = str(tmp_path / "export")
+
+    def export(entries, updates=None, **options):
+        entries = json.loads(json.dumps(entries))
+        manifest = labeler.export_labeled(
+            entries,
+            updates or {},
+            output_dir=output_dir,
+            fmt="npz",
+            shard_rows=1,
+            workers=2,
+            **options,
+        )
+        columns = {}
+        for shard in manifest["shards"]:
+            with np.load(os.path.join(output_dir, shard["file"])) as npz:
+                for name in npz.files:
+                    if name.endswith("_offsets"):
+                        continue
+                    if name + "_offsets" in npz.files:
+                        values = labeler.decode_strings(
+                            npz[name], npz[name + "_offsets"]
+                        )
+                    else:
+                        values = npz[name].tolist()
+                    columns.setdefault(name, []).extend(values)
+        return manifest, columns
+
+    return export
+
+
+def test_export_labeled_pairs(export):
+    manifest, columns = export(ENTRIES, {("Fire // Ice", "Opt"): {"similarity": 1.0}})
+
+    assert manifest["rows"] == 4
+    assert [s["file"] for s in manifest["shards"]] == [
+        f"part-{i:05d}.npz" for i in range(4)
+    ]
+    assert "strings" in manifest
+    assert columns["card1"] == ["Æther Vial", "Opt", "Fire // Ice", "Opt"]
+    assert columns["card2"] == ["Opt", "Fire // Ice", "Æther Vial", "Missing Card"]
+    assert columns["card1_tags"][0] == "ramp|aura"
+    assert columns["card2_type"][:2] == ["Instant", "Instant"]
+    assert "Scry 1." in columns["card1_text"][1]
+    assert columns["card2_text"][3] == ""
+    assert columns["similarity"][1] == 1.0
+    assert columns["synergy_manual"][0] == 1.0
+    assert np.isnan(columns["synergy_manual"][2])
+    assert columns["synergy_edhrec"][2] == 0.25
+
+
+def test_export_all_pairs(export):
+    manifest, _ = export(ENTRIES)
+    assert manifest["rows"] == 3
+    manifest, columns = export(ENTRIES, labeled_only=False)
+    assert manifest["rows"] == 4
+    assert columns["card1"][1] == "Opt"
+    assert np.isnan(columns["similarity"][1])
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        labeler.export_labeled([], {}, fmt="csv")
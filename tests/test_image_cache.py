@@ -0,0 +1,115 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import synergy_labeler_2 as labeler
+
+URL = "https://example.test/bolt.png"
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    calls = []
+
+    def download_image(url, rate_limiter=None):
+        calls.append(url)
+        return Image.new("RGB", (100, 140), "blue")
+
+    monkeypatch.setattr(labeler, "download_image", download_image)
+    return calls
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(labeler, "IMAGE_CACHE_DIR", str(tmp_path))
+    return labeler.ImageDiskCache(str(tmp_path))
+
+
+def write_legacy(cache, name, color="red"):
+    path = labeler.legacy_image_path(name, cache.cache_dir)
+    Image.new("RGB", (50, 70), color).save(path)
+    return path
+
+
+def test_rendition_is_stored_at_display_height(cache, downloads):
+    img = cache.get("id-1", URL, "Lightning Bolt")
+    assert img.size[1] == cache.rendition_height()
+    assert downloads == [URL]
+
+    again = cache.get("id-1", URL, "Lightning Bolt")
+    assert again.size == img.size
+    assert downloads == [URL]
+
+
+def test_manifest_survives_a_restart(cache, downloads):
+    cache.get("id-1", URL, "Lightning Bolt")
+    reopened = labeler.ImageDiskCache(cache.cache_dir)
+    assert reopened.lookup("id-1", URL) is not None
+    reopened.get("id-1", URL, "Lightning Bolt")
+    assert downloads == [URL]
+
+
+def test_new_url_or_height_makes_the_rendition_stale(cache, downloads, monkeypatch):
+    cache.get("id-1", URL, "Lightning Bolt")
+    assert cache.lookup("id-1", URL + "?v=2") is None
+    monkeypatch.setattr(labeler, "CARD_IMAGE_HEIGHT", labeler.CARD_IMAGE_HEIGHT + 1)
+    assert cache.lookup("id-1", URL) is None
+
+
+def test_face_without_url_gets_an_uncached_placeholder(cache, downloads):
+    assert cache.get("id-1", None, "Lightning Bolt") is not None
+    assert cache.manifest == {}
+    assert downloads == []
+
+
+def test_valid_legacy_png_is_migrated(cache, downloads):
+    write_legacy(cache, "Lightning Bolt")
+    img = cache.get("id-1", URL, "Lightning Bolt")
+    assert downloads == []
+    assert img.size[1] == cache.rendition_height()
+    assert cache.lookup("id-1", URL) is not None
+
+
+def test_truncated_legacy_png_is_deleted_and_downloaded(cache, downloads):
+    path = write_legacy(cache, "Lightning Bolt")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[: len(data) // 2])
+
+    img = cache.get("id-1", URL, "Lightning Bolt")
+
+    assert downloads == [URL]
+    assert img.size[1] == cache.rendition_height()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("name", ["Fire // Ice", "Un_Card"])
+def test_ambiguous_legacy_names_are_downloaded(cache, downloads, name):
+    write_legacy(cache, name)
+    cache.get("id-1", URL, name)
+    assert downloads == [URL]
+
+
+def test_gc(cache, downloads):
+    cache.get("id-1", URL, "Lightning Bolt")
+    cache.get("id-2", URL + "2", "Opt")
+    kept = os.path.join(cache.cache_dir, cache.manifest["id-1"]["file"])
+    os.remove(os.path.join(cache.cache_dir, cache.manifest["id-2"]["file"]))
+    orphan = os.path.join(cache.renditions_dir, "orphan_800.webp")
+    tmp = os.path.join(cache.renditions_dir, "x.123.tmp")
+    for path in [orphan, tmp]:
+        with open(path, "wb") as f:
+            f.write(b"x")
+    legacy = write_legacy(cache, "Opt")
+
+    assert cache.gc() == 2
+    assert os.path.exists(kept) and os.path.exists(legacy)
+    assert not os.path.exists(orphan) and not os.path.exists(tmp)
+    with open(cache.manifest_file, encoding="utf-8") as f:
+        assert [json.loads(line)["key"] for line in f] == ["id-1"]
+
+    assert cache.gc(remove_legacy=True) == 1
+    assert not os.path.exists(legacy)
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import synergy_labeler_2 as labeler
+
+ITEMS = [
+    {"card1": {"name": "Fire // Ice"}, "synergy": 4.5e3, "tags": ["a,b", "]"]},
+    12345,
+    -0.25,
+    'quoted "string" with [brackets], commas',
+    [],
+    {},
+    None,
+    True,
+]
+
+
+def write(tmp_path, text):
+    file = tmp_path / "items.json"
+    file.write_text(text, encoding="utf-8")
+    return str(file)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 13, 64, 1 << 20])
+def test_items_survive_every_chunk_boundary(tmp_path, chunk_size):
+    file = write(tmp_path, json.dumps(ITEMS, indent=2))
+    assert list(labeler.iter_json_array(file, chunk_size=chunk_size)) == ITEMS
+
+
+def test_with_text_yields_the_source_of_each_item(tmp_path):
+    text = '[ {"a": 1,  "b": [1, 2]} ,\n  4.5e3,"x"]'
+    file = write(tmp_path, text)
+    items = list(labeler.iter_json_array(file, chunk_size=4, with_text=True))
+    assert items == [
+        ({"a": 1, "b": [1, 2]}, '{"a": 1,  "b": [1, 2]}'),
+        (4500.0, "4.5e3"),
+        ("x", '"x"'),
+    ]
+
+
+@pytest.mark.parametrize("text", ["", "  \n", "[]", "[ \n ]"])
+def test_empty_input(tmp_path, text):
+    assert list(labeler.iter_json_array(write(tmp_path, text))) == []
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "[1 2]",
+        "[1,,2]",
+        "[,1]",
+        "[1,]",
+        "[1, 2",
+        "[1, 2,",
+        '{"a": 1}',
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 20])
+def test_malformed_arrays_raise(tmp_path, text, chunk_size):
+    file = write(tmp_path, text)
+    with pytest.raises(ValueError):
+        list(labeler.iter_json_array(file, chunk_size=chunk_size))
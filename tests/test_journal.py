@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import synergy_labeler_2 as labeler
+
+
+def entry(card1, card2, **fields):
+    return {"card1": {"name": card1}, "card2": {"name": card2}, **fields}
+
+
+ENTRIES = [
+    entry("A", "B", synergy_edhrec=0.5),
+    entry("B", "A", synergy_edhrec=0.5),
+    entry("A", "C", synergy_edhrec=0.2),
+    entry("B", "D", synergy_edhrec=0.4),
+]
+
+
+def test_replay_journal_skips_torn_line_and_keeps_last_event(tmp_path):
+    file = str(tmp_path / "journal.jsonl")
+    journal = labeler.LabelJournal(file, fsync_every=2)
+    journal.append("B", "A", "synergy_manual", 0.0)
+    journal.append("A", "B", "synergy_manual", 1.0)
+    journal.append("C", "A", "similarity", 0.5)
+    journal.close()
+    with open(file, "a", encoding="utf-8") as f:
+        f.write('{"card1":"A","card2":"D","fie')
+
+    updates = labeler.replay_journal(labeler.read_journal(file))
+
+    assert updates == {
+        ("A", "B"): {"synergy_manual": 1.0},
+        ("A", "C"): {"similarity": 0.5},
+    }
+
+
+def test_journal_reset_empties_the_file(tmp_path):
+    file = str(tmp_path / "journal.jsonl")
+    journal = labeler.LabelJournal(file)
+    journal.append("A", "B", "similarity", 1.0)
+    journal.reset()
+    journal.append("A", "C", "similarity", 0.0)
+    journal.close()
+
+    assert list(labeler.read_journal(file)) == [
+        {"card1": "A", "card2": "C", "field": "similarity", "value": 0.0}
+    ]
+
+
+def test_missing_journal_replays_to_nothing(tmp_path):
+    file = str(tmp_path / "missing.jsonl")
+    assert labeler.replay_journal(labeler.read_journal(file)) == {}
+
+
+def write_synergies(tmp_path):
+    file = tmp_path / "synergies.json"
+    file.write_text(json.dumps(ENTRIES, indent=2), encoding="utf-8")
+    return str(file), file.read_bytes()
+
+
+def test_merge_updates_into_file(tmp_path):
+    file, _ = write_synergies(tmp_path)
+
+    changed = labeler.merge_updates_into_file(
+        {("A", "B"): {"synergy_manual": 1.0}}, file
+    )
+
+    entries = labeler.load_json(file)
+    assert changed == 2
+    assert entries[0]["synergy_manual"] == entries[1]["synergy_manual"] == 1.0
+    assert entries[2:] == ENTRIES[2:]
+    assert not (tmp_path / "synergies.json.tmp").exists()
+
+
+def test_merge_keeps_the_text_of_unchanged_entries(tmp_path):
+    file, original = write_synergies(tmp_path)
+    labeler.merge_updates_into_file({("B", "D"): {"similarity": 0.0}}, file)
+
+    text = (tmp_path / "synergies.json").read_bytes()
+    unchanged = json.dumps(ENTRIES[0], indent=2).replace("\n", "\n  ").encode()
+    assert unchanged in original and unchanged in text
+
+
+def test_merge_without_changes_leaves_file_untouched(tmp_path):
+    file, original = write_synergies(tmp_path)
+
+    assert labeler.merge_updates_into_file({("X", "Y"): {"similarity": 1}}, file) == 0
+
+    assert (tmp_path / "synergies.json").read_bytes() == original
+    assert not (tmp_path / "synergies.json.tmp").exists()
+
+
+def test_failed_merge_keeps_original(tmp_path, monkeypatch):
+    file, original = write_synergies(tmp_path)
+    calls = []
+
+    def crash_midway(entries, updates):
+        calls.append(1)
+        if len(calls) == 3:
+            raise OSError("disk full")
+        return 1
+
+    monkeypatch.setattr(labeler, "apply_updates", crash_midway)
+    with pytest.raises(OSError):
+        labeler.merge_updates_into_file({("A", "B"): {"synergy_manual": 1.0}}, file)
+
+    assert (tmp_path / "synergies.json").read_bytes() == original
@@ -0,0 +1,62 @@
+import synergy_labeler_2 as labeler
+
+
+def entry(card1, card2, **fields):
+    return {"card1": {"name": card1}, "card2": {"name": card2}, **fields}
+
+
+def test_track_keys_aliases_by_pair_id():
+    session = labeler.LabelSession()
+    ab, ba, cd = entry("A", "B"), entry("B", "A"), entry("C", "D")
+    ab["synergy_manual"] = 1.0
+    session.track(ab)
+    cd["similarity"] = 0.0
+    session.track(cd)
+    ba["similarity"] = 1.0
+    session.track(ba)
+
+    assert list(session.labeled) == [("A", "B"), ("C", "D")]
+    assert session.labeled[("A", "B")] is ba
+
+
+def test_track_forgets_unlabeled_pairs():
+    session = labeler.LabelSession()
+    ab = entry("A", "B", synergy_manual=1.0)
+    session.track(ab)
+    ab["synergy_manual"] = None
+    session.track(ab)
+    assert session.labeled == {}
+
+
+def test_undo_redo():
+    session = labeler.LabelSession()
+    ab = entry("A", "B")
+    session.record(0, ab, "synergy_manual", None, 1.0)
+    session.record(0, ab, "synergy_manual", 1.0, 0.5)
+
+    assert session.undo() == (0, ab, "synergy_manual", 1.0)
+    assert session.undo() == (0, ab, "synergy_manual", None)
+    assert session.undo() is None
+    assert session.redo() == (0, ab, "synergy_manual", 1.0)
+    assert session.redo() == (0, ab, "synergy_manual", 0.5)
+    assert session.redo() is None
+
+
+def test_new_label_clears_redo():
+    session = labeler.LabelSession()
+    ab = entry("A", "B")
+    session.record(0, ab, "similarity", None, 1.0)
+    session.undo()
+    session.record(1, ab, "similarity", None, 0.0)
+    assert session.redo() is None
+    assert session.undo() == (1, ab, "similarity", None)
+
+
+def test_undo_depth_is_bounded():
+    session = labeler.LabelSession(undo_depth=3)
+    for i in range(5):
+        session.record(i, entry("A", str(i)), "similarity", None, 1.0)
+    undone = []
+    while (step := session.undo()) is not None:
+        undone.append(step[0])
+    assert undone == [4, 3, 2]
@@ -0,0 +1,176 @@
+import itertools
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+import synergy_labeler_2 as labeler
+
+CARDS = {
+    "Viscera Seer": {
+        "name": "Viscera Seer",
+        "type_line": "Creature — Vampire Wizard",
+        "oracle_text": "Sacrifice a creature: Scry 1.",
+        "tags_labels": ["Sacrifice-Outlet"],
+    },
+    "Blood Artist": {
+        "name": "Blood Artist",
+        "type_line": "Creature — Vampire",
+        "oracle_text": "Whenever Blood Artist or another creature dies, drain 1.",
+        "tags_labels": ["Aristocrats"],
+    },
+    "Animate Dead": {
+        "name": "Animate Dead",
+        "type_line": "Enchantment — Aura",
+        "oracle_text": "Enchant creature card in a graveyard.",
+        "tags_labels": ["Reanimation"],
+    },
+    "Dusk // Dawn": {
+        "name": "Dusk // Dawn",
+        "layout": "split",
+        "card_faces": [
+            {"name": "Dusk", "type_line": "Sorcery", "oracle_text": "Destroy."},
+            {"name": "Dawn", "type_line": "Sorcery", "oracle_text": "Return."},
+        ],
+    },
+    "Sol Ring": {"name": "Sol Ring", "type_line": "Artifact", "oracle_text": "Tap."},
+}
+# Filler pairs without card data, so that queries on one card use the
+# postings and broader ones the column scan
+PAIRS = [
+    (position * 2, pair)
+    for position, pair in enumerate(
+        list(itertools.combinations(list(CARDS) + ["?"], 2))
+        + [(f"x{i}", f"y{i}") for i in range(20)]
+    )
+]
+QUERIES = [
+    "tag:sacrifice-outlet",
+    "type:creature",
+    "type:creature type:vampire",
+    "type:creature & type:enchantment",
+    "type:enchantment & type:creature",
+    "type:creature & type:creature",
+    "type:sorcery",
+    "destroy",
+    "type:artifact & tag:aristocrats",
+    "type:planeswalker",
+]
+
+
+def matches(card, terms):
+    return card is not None and set(terms) <= labeler.card_terms(card)
+
+
+def brute_force(text):
+    sides = labeler.parse_filter_query(text)
+    found = []
+    for position, (a, b) in PAIRS:
+        a, b = CARDS.get(a), CARDS.get(b)
+        if len(sides) == 1:
+            ok = matches(a, sides[0]) or matches(b, sides[0])
+        else:
+            ok = (matches(a, sides[0]) and matches(b, sides[1])) or (
+                matches(b, sides[0]) and matches(a, sides[1])
+            )
+        if ok:
+            found.append(position)
+    return found
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_query_matches_brute_force(query):
+    index = labeler.PairFilterIndex.from_pairs(PAIRS)
+    assert sorted(index.query(query, CARDS).tolist()) == brute_force(query)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_table_index_matches_pairs_index(query):
+    entries = [{"card1": {"name": a}, "card2": {"name": b}} for _, (a, b) in PAIRS]
+    table = labeler.PairTable.from_entries(entries)
+    index = labeler.PairFilterIndex.from_table(table)
+    expected = [position // 2 for position in brute_force(query)]
+    assert sorted(index.query(query, CARDS).tolist()) == expected
+
+
+def test_card_terms_cover_faces_and_tags():
+    terms = labeler.card_terms(CARDS["Dusk // Dawn"])
+    assert {"type:sorcery", "text:destroy", "text:return"} <= terms
+    assert "tag:sacrifice-outlet" in labeler.card_terms(CARDS["Viscera Seer"])
+
+
+@pytest.mark.parametrize("query", ["a & b & c", "& type:creature", "color:red"])
+def test_bad_queries(query):
+    with pytest.raises(ValueError):
+        labeler.parse_filter_query(query)
+
+
+class FakeWidget:
+    def __init__(self, value=""):
+        self.value = value
+        self.text = None
+
+    def get(self):
+        return self.value
+
+    def config(self, text):
+        self.text = text
+
+
+def filter_app(entries, filter_text):
+    app = SimpleNamespace(
+        pair_filter=None,
+        filter_base=None,
+        synergy_entries=entries,
+        db=None,
+        card_lookup=CARDS,
+        filter_var=FakeWidget(filter_text),
+        status_label=FakeWidget(),
+        queue_positions=list(range(len(entries))),
+        current_ptr=0,
+        queues=[],
+    )
+    app.set_queue = app.queues.append
+    return app
+
+
+def run_filter(app, text):
+    future = Future()
+    future.set_result(labeler.SynergyApp.query_filter(app, text))
+    labeler.SynergyApp.filter_ready(app, future, text, 0.0)
+
+
+def test_filter_builds_the_index_once_and_keeps_queue_order():
+    entries = [{"card1": {"name": a}, "card2": {"name": b}} for _, (a, b) in PAIRS]
+    app = filter_app(entries, "type:sorcery")
+    app.queue_positions.reverse()
+
+    run_filter(app, "type:sorcery")
+    pair_filter = app.pair_filter
+    app.filter_var.value = "tag:aristocrats"
+    run_filter(app, "tag:aristocrats")
+
+    assert app.pair_filter is pair_filter
+    sorcery, aristocrats = app.queues
+    assert sorcery == sorted(
+        (p // 2 for p in brute_force("type:sorcery")), reverse=True
+    )
+    assert aristocrats == sorted(
+        (p // 2 for p in brute_force("tag:aristocrats")), reverse=True
+    )
+    assert "pairs match 'tag:aristocrats'" in app.status_label.text
+
+
+def test_filter_result_for_old_text_is_dropped():
+    entries = [{"card1": {"name": "Sol Ring"}, "card2": {"name": "Blood Artist"}}]
+    app = filter_app(entries, "type:creature")
+    run_filter(app, "type:artifact")
+    assert app.queues == []
+
+
+def test_filter_error_is_shown():
+    app = filter_app([], "color:red")
+    future = Future()
+    future.set_exception(ValueError("Unknown filter field 'color'"))
+    labeler.SynergyApp.filter_ready(app, future, "color:red", 0.0)
+    assert app.status_label.text == "Unknown filter field 'color'"
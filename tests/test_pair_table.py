@@ -0,0 +1,101 @@
+import json
+import math
+
+import pytest
+
+import synergy_labeler_2 as labeler
+
+
+def entry(card1, card2, **fields):
+    return {"card1": {"name": card1}, "card2": {"name": card2}, **fields}
+
+
+ENTRIES = [
+    entry("A", "B", synergy_edhrec=0.5),
+    entry("B", "A", synergy_edhrec=0.5),  # alias of (A, B)
+    entry("A", "C", synergy_edhrec=0.2),
+    entry("C", "D"),  # no EDHREC synergy
+    entry("B", "C", synergy_edhrec=0.1, synergy_manual=1.0),
+    entry("C", "B", synergy_edhrec=0.1),  # alias of a labeled pair
+    entry("D", "A", synergy_edhrec=0.3, similarity=0.0),
+    entry("B", "D", synergy_edhrec=0.4),
+    entry("B", "D", synergy_edhrec=0.4),  # repeat
+]
+
+
+def copies():
+    entries = json.loads(json.dumps(ENTRIES))
+    return entries, labeler.PairTable.from_entries(entries)
+
+
+@pytest.mark.parametrize("ignore_edhrec", [True, False])
+def test_build_queue_table_matches_entries(monkeypatch, ignore_edhrec):
+    monkeypatch.setattr(labeler, "IGNORE_EDHREC", ignore_edhrec)
+    entries, table = copies()
+
+    queue, stats = labeler.build_queue(entries)
+    table_queue, table_stats = labeler.build_queue(table)
+
+    assert list(table_queue) == list(queue)
+    assert table_stats == stats
+    if ignore_edhrec:
+        assert list(queue) == [0, 2, 3, 7]
+        assert stats == {"entries": 6, "labeled": 2}
+    else:
+        assert list(queue) == [0, 2, 7]
+        assert stats == {"entries": 5, "labeled": 2}
+
+
+def test_apply_updates_table_matches_entries(monkeypatch):
+    monkeypatch.setattr(labeler, "IGNORE_EDHREC", True)
+    entries, table = copies()
+    updates = {
+        ("A", "B"): {"similarity": 1.0},
+        ("B", "C"): {"synergy_manual": 1.0},  # only the (C, B) alias changes
+        ("A", "Z"): {"similarity": 1.0},  # unknown card
+    }
+
+    assert labeler.apply_updates(entries, updates) == 3
+    assert labeler.apply_updates(table, updates) == 3
+
+    queue, stats = labeler.build_queue(entries)
+    assert list(labeler.build_queue(table)[0]) == list(queue) == [2, 3, 7]
+    assert stats == {"entries": 6, "labeled": 3}
+
+
+def test_views_read_and_write_like_entries():
+    entries, table = copies()
+    assert len(table) == len(entries)
+    for view, original in zip(table, entries):
+        assert view["card1"]["name"] == original["card1"]["name"]
+        for field in labeler.PAIR_COLUMNS:
+            # float32 columns
+            assert view.get(field) == pytest.approx(original.get(field))
+    assert table[0] is table[0]
+    assert labeler.pair_id(table[1]) == table.pair_id(1) == ("A", "B")
+
+    view = table[3]
+    view["synergy_manual"] = 0.5
+    assert labeler.is_labeled(view)
+    view["synergy_manual"] = None
+    assert not labeler.is_labeled(view)
+    assert math.isnan(table.columns["synergy_manual"][3])
+    with pytest.raises(KeyError):
+        view["note"] = "not a column"
+    with pytest.raises(IndexError):
+        table[len(table)]
+
+
+def test_replace_card_adds_a_card_id():
+    _, table = copies()
+    table[0]["card2"]["name"] = "Zed"
+    assert table.pair_id(0) == ("A", "Zed")
+    assert table.card_names[-1] == "Zed"
+    assert table.pair_id(1) == ("A", "B")
+
+
+def test_from_json_streams_the_file(tmp_path):
+    file = str(tmp_path / "synergies.json")
+    labeler.save_json(ENTRIES, file)
+    table = labeler.PairTable.from_json(file)
+    assert [labeler.pair_id(v) for v in table] == [labeler.pair_id(e) for e in ENTRIES]
@@ -0,0 +1,99 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import synergy_labeler_2 as labeler
+
+
+def entry(card1, card2, **fields):
+    return {"card1": {"name": card1}, "card2": {"name": card2}, **fields}
+
+
+ENTRIES = [
+    entry("A", "B", synergy_predicted=0.9, synergy_edhrec=0.9),
+    entry("A", "C", synergy_predicted=0.5, synergy_edhrec=0.5),
+    entry("B", "C", synergy_predicted=0.1, synergy_edhrec=0.9),
+    entry("C", "D", synergy_predicted=0.6),
+    entry("A", "D", synergy_manual=1.0),
+    entry("E", "F"),
+]
+
+
+@pytest.fixture(params=["entries", "table"])
+def make_ranker(request, monkeypatch):
+    monkeypatch.setattr(labeler, "DECISION_BOUNDARY", 0.5)
+
+    def make(weights):
+        entries = ENTRIES
+        if request.param == "table":
+            entries = labeler.PairTable.from_entries(ENTRIES)
+        return labeler.PriorityRanker(entries, weights)
+
+    return make
+
+
+def test_uncertainty_puts_the_decision_boundary_first(make_ranker):
+    ranker = make_ranker({"uncertainty": 1.0})
+    assert ranker.rank([0, 1, 2, 3, 5]).tolist() == [1, 3, 0, 2, 5]
+
+
+def test_disagreement_with_edhrec(make_ranker):
+    ranker = make_ranker({"disagreement": 1.0})
+    assert ranker.rank([0, 1, 2, 3, 5]).tolist() == [2, 0, 1, 3, 5]
+
+
+def test_coverage_follows_set_labeled(make_ranker):
+    ranker = make_ranker({"coverage": 1.0})
+    # A and D already have a label (pair 4), so pairs without them come first
+    assert ranker.rank([0, 2, 3, 5]).tolist() == [2, 5, 0, 3]
+
+    ranker.set_labeled(2, True)
+    ranker.set_labeled(2, True)  # a relabel does not count twice
+    # A, B, C and D have one label each now
+    assert ranker.rank([0, 3, 5]).tolist() == [5, 0, 3]
+
+    ranker.set_labeled(4, False)
+    ranker.set_labeled(2, False)
+    assert ranker.rank([0, 3, 5]).tolist() == [0, 3, 5]
+
+
+def test_zero_weights_keep_the_queue_order(make_ranker):
+    ranker = make_ranker({"uncertainty": 0.0, "coverage": 0.0})
+    assert ranker.rank([5, 3, 0]).tolist() == [5, 3, 0]
+
+
+def test_rank_of_nothing(make_ranker):
+    ranker = make_ranker(labeler.PRIORITY_WEIGHTS)
+    assert ranker.rank([]).tolist() == []
+
+
+def test_ranker_survives_a_card_added_to_the_table():
+    table = labeler.PairTable.from_entries(ENTRIES)
+    ranker = labeler.PriorityRanker(table)
+    table[0]["card1"]["name"] = "Zed"
+    assert sorted(ranker.rank(np.arange(4)).tolist()) == [0, 1, 2, 3]
+
+
+def finished(result):
+    future = Future()
+    future.set_result(np.asarray(result))
+    return future
+
+
+def test_rerank_result_keeps_pairs_reached_meanwhile():
+    positions = list(range(10))
+    app = SimpleNamespace(queue_positions=positions, current_ptr=5, rerank_job=1)
+    # Ranked from ptr 2 on; the user moved on to ptr 5 meanwhile
+    labeler.SynergyApp.reranked(app, finished([9, 8, 7, 6, 5, 4, 3]), positions, 3)
+    assert app.queue_positions == [0, 1, 2, 3, 4, 5, 9, 8, 7, 6]
+    assert app.rerank_job is None
+
+
+def test_rerank_result_for_a_replaced_queue_is_dropped():
+    positions = list(range(5))
+    app = SimpleNamespace(queue_positions=[4, 2], current_ptr=0, rerank_job=1)
+    labeler.SynergyApp.reranked(app, finished([4, 3, 2]), positions, 2)
+    assert app.queue_positions == [4, 2]
+    assert positions == list(range(5))
@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+import synergy_labeler_2 as labeler
+
+
+def entry(card1, card2, **fields):
+    return {"card1": {"name": card1}, "card2": {"name": card2}, **fields}
+
+
+ENTRIES = [
+    entry("A", "B", synergy_edhrec=0.5),
+    entry("A", "C", synergy_edhrec=0.2),
+    entry("C", "D"),  # no EDHREC synergy
+    entry("B", "C", synergy_edhrec=0.1, synergy_manual=1.0),
+    entry("D", "A", synergy_edhrec=0.3, similarity=0.0),
+    entry("B", "D", synergy_edhrec=0.4),
+]
+
+
+@pytest.mark.parametrize(
+    "ignore_edhrec, queue, stats",
+    [
+        (True, [0, 1, 2, 5], {"entries": 6, "labeled": 2}),
+        (False, [0, 1, 5], {"entries": 5, "labeled": 2}),
+    ],
+)
+def test_build_queue(monkeypatch, ignore_edhrec, queue, stats):
+    monkeypatch.setattr(labeler, "IGNORE_EDHREC", ignore_edhrec)
+    built, built_stats = labeler.build_queue(ENTRIES)
+    assert list(built) == queue
+    assert built_stats == stats
+
+
+@pytest.fixture
+def source(tmp_path):
+    file = tmp_path / "synergies.json"
+    file.write_text("[]", encoding="utf-8")
+    return str(file)
+
+
+def test_queue_file_round_trip(tmp_path, source):
+    queue, stats = labeler.build_queue(ENTRIES)
+    file = str(tmp_path / "queue.bin")
+    labeler.save_queue(queue, stats, source, file)
+
+    assert labeler.load_queue(file, source) == (queue, stats)
+    assert sorted(os.listdir(tmp_path)) == ["queue.bin", "synergies.json"]
+
+
+def test_queue_file_is_stale_after_source_changes(tmp_path, source):
+    file = str(tmp_path / "queue.bin")
+    labeler.save_queue(*labeler.build_queue(ENTRIES), source, file)
+    with open(source, "w", encoding="utf-8") as f:
+        f.write("[ ]")
+    assert labeler.load_queue(file, source) is None
+
+
+def test_queue_file_is_stale_for_other_edhrec_mode(tmp_path, source, monkeypatch):
+    file = str(tmp_path / "queue.bin")
+    labeler.save_queue(*labeler.build_queue(ENTRIES), source, file)
+    monkeypatch.setattr(labeler, "IGNORE_EDHREC", not labeler.IGNORE_EDHREC)
+    assert labeler.load_queue(file, source) is None
+
+
+@pytest.mark.parametrize("cut", [3, len(labeler.QUEUE_MAGIC) + 2, -2])
+def test_truncated_queue_file_is_ignored(tmp_path, source, cut):
+    file = str(tmp_path / "queue.bin")
+    labeler.save_queue(*labeler.build_queue(ENTRIES), source, file)
+    with open(file, "rb") as f:
+        data = f.read()
+    with open(file, "wb") as f:
+        f.write(data[:cut])
+    assert labeler.load_queue(file, source) is None
+
+
+def test_corrupt_header_is_ignored(tmp_path, source):
+    file = tmp_path / "queue.bin"
+    file.write_bytes(labeler.QUEUE_MAGIC + b"\x05\x00\x00\x00{bad}")
+    assert labeler.load_queue(str(file), source) is None
+
+
+def test_missing_queue_file(tmp_path, source):
+    assert labeler.load_queue(str(tmp_path / "queue.bin"), source) is None
+
+
+ALIASES = [
+    entry("A", "B", synergy_edhrec=0.5),
+    entry("B", "A", synergy_edhrec=0.5, similarity=1.0),  # labeled alias
+    entry("A", "C", synergy_edhrec=0.2),
+    entry("C", "A", synergy_edhrec=0.2),
+    entry("A", "C", synergy_edhrec=0.2),  # repeat
+    entry("C", "D", synergy_manual=0.5),
+    entry("D", "C", synergy_manual=0.0),
+]
+
+
+def test_pair_keys_ignore_order():
+    index = labeler.PairIndex()
+    assert index.key("A", "B") == index.key("B", "A") != index.key("A", "C")
+    assert labeler.pair_id(ALIASES[0]) == labeler.pair_id(ALIASES[1]) == ("A", "B")
+
+
+def test_build_queue_counts_aliases_once():
+    queue, stats = labeler.build_queue(ALIASES)
+    assert list(queue) == [2]
+    assert stats == {"entries": 3, "labeled": 2}
+
+
+def test_label_statistics_counts_aliases_once():
+    stats = labeler.label_statistics(ALIASES)
+    assert stats["entries"] == 3
+    assert stats["labeled"] == 2
+    # First alias carrying a field wins
+    assert stats["synergy_manual"] == {0.5: 1}
+    assert stats["similarity"] == {1.0: 1}
+    assert stats["cards"] == 4
+
+
+def test_dedup_keeps_the_first_alias_with_every_label(tmp_path):
+    file = str(tmp_path / "synergies.json")
+    labeler.save_json(ALIASES, file)
+
+    labeler.main(["dedup", "--synergy-file", file])
+
+    assert labeler.load_json(file) == [
+        entry("A", "B", synergy_edhrec=0.5, similarity=1.0),
+        entry("A", "C", synergy_edhrec=0.2),
+        entry("C", "D", synergy_manual=0.5),
+    ]
@@ -0,0 +1,78 @@
+import pytest
+
+import synergy_labeler_2 as labeler
+
+ENTRIES = [
+    {
+        "card1": {"name": "A"},
+        "card2": {"name": "B"},
+        "synergy_predicted": 0.25,
+        "synergy_edhrec": 0.5,
+        "synergy": 0.75,
+        "synergy_manual": 1.0,
+        "similarity": 0.0,
+    },
+    # Other field order, no label and no EDHREC columns
+    {"synergy_predicted": 0.5, "card2": {"name": "A"}, "card1": {"name": "B"}},
+    # Card objects with more than a name, an extra field and an explicit null
+    {
+        "card1": {"name": "C", "id": "c-1"},
+        "card2": {"name": "D"},
+        "synergy_edhrec": None,
+        "note": ["kept", 1],
+    },
+    {"card1": {"name": "A"}, "card2": {"name": "D"}, "synergy_edhrec": 0.1},
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    source = str(tmp_path / "synergies.json")
+    labeler.save_json(ENTRIES, source)
+    db = labeler.SynergyDB(str(tmp_path / "synergies.sqlite3"))
+    db.import_json(source)
+    yield db
+    db.close()
+
+
+def test_export_is_byte_identical_to_the_import(db, tmp_path):
+    exported = str(tmp_path / "exported.json")
+    db.export_json(exported)
+    with open(tmp_path / "synergies.json", "rb") as f:
+        original = f.read()
+    with open(exported, "rb") as f:
+        assert f.read() == original
+
+
+def test_labels_set_after_the_import_are_exported(db, tmp_path):
+    db.set_label("A", "B", "similarity", 1.0)
+    db.set_label("C", "D", "synergy_manual", 0.5)
+    exported = str(tmp_path / "exported.json")
+    db.export_json(exported)
+
+    entries = labeler.load_json(exported)
+    # Every alias of (A, B) is labeled
+    assert entries[0]["similarity"] == entries[1]["similarity"] == 1.0
+    assert list(entries[1]) == list(ENTRIES[1]) + ["similarity"]
+    assert entries[2] == {**ENTRIES[2], "synergy_manual": 0.5}
+
+
+def test_entry_and_queue(db, monkeypatch):
+    monkeypatch.setattr(labeler, "IGNORE_EDHREC", True)
+    assert db.entry(2) == ENTRIES[2]
+    assert list(db.queue_pairs()) == [(2, ("C", "D")), (3, ("A", "D"))]
+    assert db.stats() == {"entries": 3, "labeled": 1}
+
+    monkeypatch.setattr(labeler, "IGNORE_EDHREC", False)
+    assert list(db.queue_pairs()) == [(3, ("A", "D"))]
+    assert db.stats() == {"entries": 2, "labeled": 1}
+
+
+def test_apply_updates_and_reimport(db, tmp_path):
+    db.apply_updates({("A", "D"): {"synergy_manual": 0.0, "similarity": 1.0}})
+    assert db.entry(3)["similarity"] == 1.0
+    assert not db.is_empty()
+
+    db.import_json(str(tmp_path / "synergies.json"))
+    assert db.entry(3).get("similarity") is None
+    assert list(db.iter_entries()) == ENTRIES
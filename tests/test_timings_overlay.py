@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import synergy_labeler_2 as labeler
+
+
+class FakeRoot:
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after(self, ms, fn):
+        self.next_id += 1
+        self.pending[self.next_id] = fn
+        return self.next_id
+
+    def after_cancel(self, job):
+        del self.pending[job]
+
+    def run_pending(self):
+        pending, self.pending = self.pending, {}
+        for fn in pending.values():
+            fn()
+
+
+class FakeLabel:
+    """
+    Like a Tk label before the event loop runs: place() does not map it yet.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.placed = False
+
+    def place(self, **options):
+        self.placed = True
+
+    def place_forget(self):
+        self.placed = False
+
+    def winfo_ismapped(self):
+        return False
+
+    def config(self, text):
+        self.text = text
+
+
+def make_app():
+    app = SimpleNamespace(
+        root=FakeRoot(),
+        timings_overlay=FakeLabel(),
+        overlay_visible=False,
+        overlay_refresh=None,
+    )
+    for name in ["toggle_timings_overlay", "refresh_timings_overlay"]:
+        method = getattr(labeler.SynergyApp, name)
+        setattr(app, name, method.__get__(app))
+    return app
+
+
+def test_f12_shows_and_refreshes_the_overlay():
+    app = make_app()
+    labeler.TIMINGS.record("test_stage", 0.002)
+
+    app.toggle_timings_overlay()
+
+    assert app.timings_overlay.placed
+    assert "test_stage" in app.timings_overlay.text
+    assert len(app.root.pending) == 1
+    app.root.run_pending()
+    assert len(app.root.pending) == 1
+
+
+def test_f12_again_hides_it_and_stops_refreshing():
+    app = make_app()
+    app.toggle_timings_overlay()
+    app.toggle_timings_overlay()
+    assert not app.timings_overlay.placed
+    assert app.root.pending == {}
+
+
+def test_quick_presses_keep_one_refresh_chain():
+    app = make_app()
+    for _ in range(5):
+        app.toggle_timings_overlay()
+    assert app.timings_overlay.placed
+    assert len(app.root.pending) == 1
+    app.root.run_pending()
+    assert len(app.root.pending) == 1